@@ -1,11 +1,27 @@
-from flask import Flask, request, jsonify
-from pymongo import MongoClient
+from flask import Flask, g, request, jsonify
+import click
+from pymongo import ASCENDING, MongoClient, monitoring
+from pymongo.errors import OperationFailure, PyMongoError
+import hmac
 import logging
+import os
+import re
+import threading
+import time
 import uuid
-from bson import Binary
+from collections import Counter, OrderedDict
+from collections.abc import Hashable
+from contextvars import ContextVar
+from functools import lru_cache, partial
+from typing import Any, Callable, NamedTuple, Optional
+import numpy as np
+from bson import Binary, ObjectId
 from os import getenv
 from dotenv import load_dotenv
 from flasgger import Swagger, swag_from
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter as MetricCounter, Gauge, Histogram, generate_latest, multiprocess
+)
 
 app = Flask(__name__)
 
@@ -50,229 +66,2707 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-try:
-    client = MongoClient(getenv('URI_MONGODB'))
-    db = client[getenv('MONGO_DBNAME')]
-    collection = db[getenv('MONGO_COLLECTION')]
-    logger.info("Conexão com o MongoDB estabelecida com sucesso.")
-except Exception as e:
-    logger.error(f"Erro ao conectar ao MongoDB: {e}")
-    raise
+# Métricas no formato do Prometheus, expostas em /metrics. Com vários workers do Gunicorn, defina
+# PROMETHEUS_MULTIPROC_DIR no ambiente do processo (não no .env, lido depois da importação do
+# prometheus_client) para que /metrics agregue os valores de todos os workers.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_COUNT = MetricCounter(
+    'hestia_http_requests_total', 'Requisições HTTP atendidas, por rota, método e status.',
+    ['route', 'method', 'status']
+)
+REQUEST_DURATION = Histogram(
+    'hestia_http_request_duration_seconds', 'Latência das requisições HTTP, por rota e método.',
+    ['route', 'method'], buckets=LATENCY_BUCKETS
+)
+MONGO_COMMAND_COUNT = MetricCounter(
+    'hestia_mongo_commands_total', 'Comandos enviados ao MongoDB, por comando e resultado.',
+    ['command', 'status']
+)
+MONGO_COMMAND_DURATION = Histogram(
+    'hestia_mongo_command_duration_seconds', 'Latência dos comandos do MongoDB, por comando.',
+    ['command'], buckets=LATENCY_BUCKETS
+)
+CANDIDATES_SCORED = MetricCounter(
+    'hestia_candidates_scored_total', 'Moradias avaliadas pelo cálculo em Python (catálogo ou MongoDB).'
+)
+RESULT_CACHE_REQUESTS = MetricCounter(
+    'hestia_result_cache_requests_total', 'Consultas ao cache de recomendações, por resultado (hit ou miss).',
+    ['result']
+)
+CATALOGUE_HOUSES = Gauge(
+    'hestia_catalogue_houses', 'Moradias no catálogo residente.', multiprocess_mode='livemax'
+)
+CATALOGUE_PROFILES = Gauge(
+    'hestia_catalogue_distinct_profiles', 'Perfis distintos no vocabulário do catálogo residente.',
+    multiprocess_mode='livemax'
+)
+CATALOGUE_LAST_SYNC = Gauge(
+    'hestia_catalogue_last_sync_timestamp_seconds',
+    'Instante (Unix) da última sincronização do catálogo com o MongoDB; o worker mais desatualizado.',
+    multiprocess_mode='livemin'
+)
+
+def metrics_registry():
+    """Retorna o registro a exportar: o do processo ou, em modo multiprocesso, a agregação de todos os workers."""
+    if not getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def start_request_metrics():
+    """Hook before_request: marca o início da requisição."""
+    g.metrics_started = time.perf_counter()
+
+def record_request_metrics(url_rule, method: str, status_code: int, started: float) -> None:
+    """
+    Conta uma requisição e registra a sua latência, rotuladas pelo padrão da rota.
+
+    Compartilhada pelos hooks do Flask e do app_async (Quart).
+
+    Args:
+        url_rule: A regra de rota da requisição (request.url_rule), ou None se nenhuma rota corresponder.
+        method (str): O método HTTP.
+        status_code (int): O status da resposta.
+        started (float): O instante de início da requisição, em time.perf_counter().
+    """
+    route = url_rule.rule if url_rule is not None else 'unmatched'
+    REQUEST_COUNT.labels(route, method, status_code).inc()
+    REQUEST_DURATION.labels(route, method).observe(time.perf_counter() - started)
+
+def finish_request_metrics(response):
+    """Hook after_request: registra as métricas da requisição com record_request_metrics()."""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        record_request_metrics(request.url_rule, request.method, response.status_code, started)
+    return response
+
+app.before_request(start_request_metrics)
+app.after_request(finish_request_metrics)
+
+# Medição do tempo de cada etapa das requisições (cabeçalho Server-Timing e histogramas em /metrics)
+STAGE_TIMING = getenv('STAGE_TIMING', 'false').lower() == 'true'
+
+STAGE_DURATION = Histogram(
+    'hestia_stage_duration_seconds',
+    'Tempo de parede de cada etapa de uma requisição de recomendações, somado por requisição.',
+    ['stage'],
+    buckets=LATENCY_BUCKETS
+)
+
+class StageTimer:
+    """Acumula, durante uma requisição, o tempo de parede e o número de chamadas de cada etapa."""
+
+    __slots__ = ('started', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        total, calls = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (total + seconds, calls + 1)
+
+    def server_timing(self) -> str:
+        """Retorna o valor do cabeçalho Server-Timing, com as etapas e o tempo total da requisição."""
+        metrics = [f'{stage};dur={total * 1000:.2f};desc="{calls} chamadas"' for stage, (total, calls) in self.stages.items()]
+        metrics.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def observe(self) -> None:
+        """Registra o tempo de cada etapa nos histogramas de STAGE_DURATION."""
+        for stage, (total, _) in self.stages.items():
+            STAGE_DURATION.labels(stage).observe(total)
+        STAGE_DURATION.labels('total').observe(time.perf_counter() - self.started)
+
+_stage_timer: ContextVar[Optional[StageTimer]] = ContextVar('stage_timer', default=None)
+
+class timed_stage:
+    """
+    Gerenciador de contexto que mede uma etapa da requisição atual: with timed_stage('filters'): ...
+
+    Sem STAGE_TIMING não há StageTimer na requisição e o custo é o de uma leitura de ContextVar.
+    """
+
+    __slots__ = ('stage', 'timer', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.timer = _stage_timer.get()
+        if self.timer is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            self.timer.record(self.stage, time.perf_counter() - self.started)
+        return False
+
+def start_stage_timing():
+    """Hook before_request: cria o StageTimer da requisição."""
+    _stage_timer.set(StageTimer())
+
+def finish_stage_timing(response):
+    """Hook after_request: adiciona o cabeçalho Server-Timing e registra os tempos nos histogramas."""
+    timer = _stage_timer.get()
+    if timer is not None:
+        response.headers['Server-Timing'] = timer.server_timing()
+        timer.observe()
+        _stage_timer.set(None)
+    return response
+
+if STAGE_TIMING:
+    app.before_request(start_stage_timing)
+    app.after_request(finish_stage_timing)
+
+# Opções do pool de conexões e timeouts do MongoClient: (variável de ambiente, opção do PyMongo, tipo)
+MONGO_CLIENT_OPTIONS = [
+    ('MONGO_MAX_POOL_SIZE', 'maxPoolSize', int),
+    ('MONGO_MIN_POOL_SIZE', 'minPoolSize', int),
+    ('MONGO_MAX_IDLE_TIME_MS', 'maxIdleTimeMS', int),
+    ('MONGO_WAIT_QUEUE_TIMEOUT_MS', 'waitQueueTimeoutMS', int),
+    ('MONGO_SERVER_SELECTION_TIMEOUT_MS', 'serverSelectionTimeoutMS', int),
+    ('MONGO_CONNECT_TIMEOUT_MS', 'connectTimeoutMS', int),
+    ('MONGO_SOCKET_TIMEOUT_MS', 'socketTimeoutMS', int),
+    ('MONGO_COMPRESSORS', 'compressors', str)
+]
+
+def mongo_client_options() -> dict:
+    """
+    Lê das variáveis de ambiente as opções do pool de conexões e dos timeouts do MongoClient.
+
+    Variáveis não definidas (ou vazias) mantêm o padrão do PyMongo. MONGO_COMPRESSORS aceita uma
+    lista separada por vírgulas ('zstd', 'snappy' ou 'zlib'); 'zstd' e 'snappy' exigem os pacotes
+    zstandard e python-snappy.
+
+    Returns:
+        dict: Argumentos nomeados para MongoClient.
+    """
+    options = {}
+    for env_name, option, cast in MONGO_CLIENT_OPTIONS:
+        value = getenv(env_name)
+        if value:
+            options[option] = cast(value)
+    return options
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Acompanha os eventos do pool de conexões do MongoClient e acumula métricas de uso.
+
+    Métricas: conexões abertas, conexões em uso (checked out), total de checkouts, checkouts que
+    falharam e o tempo de espera por uma conexão (total e máximo).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Zera as métricas. Usado também no processo filho após um fork, que começa com um pool novo."""
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.pool_clears = 0
+
+    def stats(self) -> dict:
+        """Retorna as métricas do pool."""
+        with self._lock:
+            return {
+                'open_connections': self.open_connections,
+                'checked_out': self.checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'checkout_wait_avg_ms': round(self.checkout_wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'checkout_wait_max_ms': round(self.checkout_wait_max * 1000, 3),
+                'pool_clears': self.pool_clears
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.checkout_wait_total += event.duration
+            self.checkout_wait_max = max(self.checkout_wait_max, event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+pool_stats = PoolStatsListener()
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Conta os comandos enviados ao MongoDB e registra as suas latências nas métricas do Prometheus."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_COUNT.labels(event.command_name, 'ok').inc()
+        MONGO_COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_COUNT.labels(event.command_name, 'error').inc()
+        MONGO_COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+command_metrics = CommandMetricsListener()
+
+def prewarm_mongo(client: MongoClient) -> None:
+    """
+    Estabelece a conexão com o MongoDB na inicialização, em vez de na primeira requisição.
+
+    O ping conclui a seleção do servidor; a partir daí o PyMongo mantém em segundo plano ao menos
+    MONGO_MIN_POOL_SIZE conexões abertas. Falhas são apenas registradas, pois o driver tenta
+    reconectar nas próximas operações.
+    """
+    try:
+        started = time.perf_counter()
+        client.admin.command('ping')
+        logger.info(f"Pool de conexões do MongoDB aquecido em {(time.perf_counter() - started) * 1000:.1f} ms.")
+    except Exception as e:
+        logger.warning(f"Não foi possível aquecer o pool de conexões do MongoDB: {e}")
+
+# Conexão com o MongoDB do processo atual. O MongoClient não pode ser compartilhado entre processos
+# (não é fork-safe), então cada processo cria o seu na primeira utilização.
+_mongo_lock = threading.Lock()
+_mongo_pid = None
+_mongo_client = None
+_mongo_collection = None
+_collection_override = None
+
+def get_mongo_client() -> MongoClient:
+    """
+    Retorna o MongoClient do processo atual, criando-o (e aquecendo o pool) na primeira chamada.
+
+    Um processo filho criado por fork (por exemplo, um worker do Gunicorn) nunca reutiliza o
+    cliente do processo pai: a mudança de PID faz com que um novo cliente seja criado.
+
+    Returns:
+        MongoClient: O cliente do processo atual.
+    """
+    global _mongo_pid, _mongo_client, _mongo_collection
+    if _mongo_client is not None and _mongo_pid == os.getpid():
+        return _mongo_client
+    with _mongo_lock:
+        if _mongo_client is None or _mongo_pid != os.getpid():
+            try:
+                client = MongoClient(
+                    getenv('URI_MONGODB'), event_listeners=[pool_stats, command_metrics], **mongo_client_options()
+                )
+                _mongo_collection = client[getenv('MONGO_DBNAME')][getenv('MONGO_COLLECTION')]
+                logger.info("Conexão com o MongoDB estabelecida com sucesso.")
+            except Exception as e:
+                logger.error(f"Erro ao conectar ao MongoDB: {e}")
+                raise
+            if getenv('MONGO_PREWARM', 'true').lower() == 'true':
+                prewarm_mongo(client)
+            _mongo_client = client
+            _mongo_pid = os.getpid()
+    return _mongo_client
+
+def get_collection():
+    """
+    Retorna a coleção de usuários do MongoDB para o processo atual.
+
+    Returns:
+        Collection: A coleção configurada em MONGO_DBNAME/MONGO_COLLECTION, ou a coleção definida com set_collection().
+    """
+    if _collection_override is not None:
+        return _collection_override
+    get_mongo_client()
+    return _mongo_collection
+
+def set_collection(collection) -> None:
+    """
+    Substitui a coleção usada pela aplicação (por exemplo, por uma coleção em memória nos benchmarks).
+
+    Args:
+        collection: A coleção a ser usada, ou None para voltar a usar a coleção do MongoDB.
+    """
+    global _collection_override
+    _collection_override = collection
+
+def _reset_mongo_after_fork() -> None:
+    """Descarta, no processo filho, a conexão herdada do processo pai."""
+    global _mongo_lock, _mongo_pid, _mongo_client, _mongo_collection
+    _mongo_lock = threading.Lock()
+    _mongo_pid = None
+    _mongo_client = None
+    _mongo_collection = None
+    pool_stats.reset()
+
+# Lista de campos a serem processados (removido 'preferencias_moveis_outro')
+FILTER_FIELDS = [
+    'animais_estimacao',
+    'preferencia_genero',
+    'numero_maximo_pessoas',
+    'frequencia_fumo',
+    'frequencia_bebida'
+]
+
+def extract_filters(document: dict) -> dict:
+    """
+    Extrai de um documento do MongoDB o dicionário de filtros usado no cálculo de correspondência.
+
+    Args:
+        document (dict): Documento do usuário (universitário ou moradia) retornado pelo MongoDB.
+
+    Returns:
+        dict: Um dicionário onde cada chave é um dos campos de FILTER_FIELDS e cada valor é o filtro correspondente.
+    """
+    filters = {}
+    for field in FILTER_FIELDS:
+        value = document.get(field)
+        if isinstance(value, str):
+            value = value.replace('[', '').replace(']', '')
+        filters[field] = value
+    # Executada para cada moradia na carga do catálogo: o log só é formatado se o nível DEBUG estiver ativo
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Filtros extraídos: %s", filters)
+    return filters
+
+def get_filters(uuid_str: str) -> dict:
+    """
+    Busca um usuário na coleção com base no UUID fornecido e retorna um dicionário de filtros extraídos de campos específicos.
+
+    Args:
+        uuid_str (str): O UUID do usuário no formato padrão (ex: '592f7f4a-ebd2-4b3a-7e46-7e1af20de594').
+
+    Returns:
+        dict: Um dicionário onde cada chave é um dos campos especificados e cada valor é uma lista de filtros.
+        Um dicionário vazio se o UUID for inválido ou o usuário não for encontrado.
+
+    Raises:
+        PyMongoError: Erros do MongoDB são propagados, para não serem confundidos com um usuário sem filtros.
+    """
+    logger.debug("Obtendo filtros para o UUID: %s", uuid_str)
+
+    # Tentar converter a string UUID para um objeto UUID
+    try:
+        uuid_obj = uuid.UUID(uuid_str)
+    except ValueError:
+        logger.error("UUID inválido fornecido.")
+        return {}
+    
+    # Converter o objeto UUID para Binary com subtype=4
+    binary_uuid = Binary(uuid_obj.bytes, subtype=4)
+    
+    # Realizar a busca no MongoDB
+    with timed_stage('filters'):
+        user = get_collection().find_one({'idUsuarioMoradia': binary_uuid})
+    if not user:
+        logger.warning("Nenhum usuário encontrado com o UUID fornecido.")
+        return {}
+    logger.debug("Usuário encontrado com sucesso.")
+    
+    return extract_filters(user)
+
+def get_filters_batch(uuid_strs: list) -> dict:
+    """
+    Busca vários usuários com uma única consulta $in e retorna os dicionários de filtros de cada um.
+
+    Args:
+        uuid_strs (list): UUIDs dos usuários no formato padrão. UUIDs inválidos são ignorados.
+
+    Returns:
+        dict: Um dicionário UUID (str, formato canônico) → dicionário de filtros, apenas com os usuários encontrados.
+
+    Raises:
+        PyMongoError: Erros do MongoDB são propagados, para que não sejam confundidos com usuários não encontrados.
+    """
+    binary_uuids = []
+    for uuid_str in uuid_strs:
+        try:
+            binary_uuids.append(Binary(uuid.UUID(uuid_str).bytes, subtype=4))
+        except ValueError:
+            logger.error(f"UUID inválido fornecido: {uuid_str}")
+
+    users = {}
+    with timed_stage('filters'):
+        cursor = get_collection().find({'idUsuarioMoradia': {'$in': binary_uuids}}, catalogue_projection())
+        for user in cursor:
+            users[str(uuid.UUID(bytes=user['idUsuarioMoradia']))] = extract_filters(user)
+    logger.debug("%d de %d usuários encontrados.", len(users), len(binary_uuids))
+    return users
+
+# Valores de filtros que possuem regras especiais no cálculo de correspondência
+ANIMAL_ALLERGY = 'Alergia'
+ANIMAL_LOVER_VALUES = ('Gosto muito', 'Não tenho, mas amo')
+GENDER_ANY = 'Tanto faz'
+
+# Condição que exclui as moradias com 'Alergia' em 'animais_estimacao' (string ou item de lista),
+# que sempre têm 0% de correspondência
+ALLERGY_FREE_QUERY = {'animais_estimacao': {'$not': re.compile(re.escape(ANIMAL_ALLERGY))}}
+
+# Número máximo de perfis de universitários com percentuais memorizados por versão do catálogo
+SCORE_MEMO_MAXSIZE = int(getenv('SCORE_MEMO_MAXSIZE', 4096))
+
+class CategoryCodes:
+    """
+    Tabela append-only que atribui um código inteiro a cada valor distinto de um campo categórico.
+
+    Valores iguais (pela igualdade do Python) recebem o mesmo código, de modo que comparar códigos
+    equivale a comparar os valores originais. Os códigos valem apenas dentro do processo.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._values = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def code(self, value: Any) -> int:
+        """Retorna o código do valor, atribuindo um novo código a valores nunca vistos."""
+        try:
+            code = self._codes.get(value)
+        except TypeError:
+            # Valores não hasheáveis nunca correspondem a outro valor
+            with self._lock:
+                self._values.append(value)
+                return len(self._values) - 1
+        if code is None:
+            with self._lock:
+                code = self._codes.setdefault(value, len(self._values))
+                if code == len(self._values):
+                    self._values.append(value)
+        return code
+
+    def value(self, code: int) -> Any:
+        """Retorna o valor original correspondente a um código."""
+        return self._values[code]
+
+    def reinit_after_fork(self) -> None:
+        """Recria o lock, que pode ter sido copiado em uso por um fork. Os códigos são mantidos."""
+        self._lock = threading.Lock()
+
+# Códigos dos campos categóricos comparados por igualdade: preferencia_genero, frequencia_fumo e frequencia_bebida
+CATEGORY_CODES = {field: CategoryCodes() for field in ('preferencia_genero', 'frequencia_fumo', 'frequencia_bebida')}
+GENDER_ANY_CODE = CATEGORY_CODES['preferencia_genero'].code(GENDER_ANY)
+
+class MatchProfile(NamedTuple):
+    """
+    Perfil de filtros imutável e pré-processado, usado pelo cálculo de correspondência.
+
+    É construído uma única vez por usuário com compile_profile(), que concentra toda a normalização
+    dos valores armazenados: 'animais_estimacao' vira os indicadores 'allergy' e 'pet_lover',
+    'numero_maximo_pessoas' vira um inteiro e os campos categóricos viram códigos de CATEGORY_CODES.
+    O cálculo de correspondência compara apenas booleanos e inteiros, e o perfil pode ser
+    compartilhado entre quantos cálculos forem necessários, já que score_profiles() nunca o altera.
+    Como o percentual depende apenas destes campos, o próprio perfil serve de assinatura para
+    memorizar resultados: usuários com filtros iguais têm perfis iguais.
+    """
+    allergy: bool
+    pet_lover: bool
+    gender: int
+    max_people: Optional[int]
+    smoking: int
+    drinking: int
+
+def _freeze(value: Any) -> Any:
+    """Converte listas e dicionários em tuplas para que o valor seja hasheável e possa receber um código de CategoryCodes."""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+def _has_animal_value(animals: Any, target: str) -> bool:
+    """Indica se o campo 'animais_estimacao' (string ou lista) contém o valor informado."""
+    if isinstance(animals, str):
+        return target in animals
+    if isinstance(animals, (list, tuple)):
+        return any(target in str(item) for item in animals)
+    return False
+
+def compile_profile(filters: dict, malformed: Optional[Counter] = None) -> MatchProfile:
+    """
+    Normaliza um dicionário de filtros (no formato de get_filters()) em um MatchProfile.
+
+    Args:
+        filters (dict): Dicionário de filtros do usuário. Um dicionário vazio representa um usuário sem filtros.
+        malformed (Counter, opcional): Se informado, recebe uma contagem para cada campo com valor
+            inválido ('animais_estimacao' que não é string nem lista, 'numero_maximo_pessoas' que não
+            é um inteiro e campos categóricos ausentes ou que não são strings) e, em 'records', uma
+            contagem se o registro tiver algum campo inválido.
+
+    Returns:
+        MatchProfile: O perfil imutável correspondente aos filtros.
+    """
+    animals = filters.get('animais_estimacao')
+
+    try:
+        max_people = int(filters.get('numero_maximo_pessoas', 0))
+    except (ValueError, TypeError, OverflowError) as e:
+        # OverflowError: doubles BSON infinitos (Infinity/-Infinity) não têm conversão para inteiro
+        logger.debug("Erro na conversão de numero_maximo_pessoas: %s", e)
+        max_people = None
+
+    if malformed is not None:
+        invalid_fields = [field for field in CATEGORY_CODES if not isinstance(filters.get(field), str)]
+        if animals is not None and not isinstance(animals, (str, list)):
+            invalid_fields.append('animais_estimacao')
+        if max_people is None:
+            invalid_fields.append('numero_maximo_pessoas')
+        if invalid_fields:
+            malformed.update(invalid_fields)
+            malformed['records'] += 1
+
+    return MatchProfile(
+        allergy=_has_animal_value(animals, ANIMAL_ALLERGY),
+        pet_lover=any(_has_animal_value(animals, value) for value in ANIMAL_LOVER_VALUES),
+        gender=CATEGORY_CODES['preferencia_genero'].code(_freeze(filters.get('preferencia_genero'))),
+        max_people=max_people,
+        smoking=CATEGORY_CODES['frequencia_fumo'].code(_freeze(filters.get('frequencia_fumo'))),
+        drinking=CATEGORY_CODES['frequencia_bebida'].code(_freeze(filters.get('frequencia_bebida')))
+    )
+
+def score_profiles(housing_profile: MatchProfile, university_profile: MatchProfile) -> float:
+    """
+    Calcula o percentual de correspondência entre dois perfis pré-processados, aplicando regras especiais.
+
+    A função não tem efeitos colaterais: os perfis não são alterados e nenhum log é emitido, o que
+    permite reutilizar o mesmo perfil de universitário para todas as moradias.
+
+    Regras:
+    - 'Alergia' em 'animais_estimacao' de qualquer um dos perfis resulta em 0%.
+    - 'Gosto muito' ou 'Não tenho, mas amo' em 'animais_estimacao' contam como um filtro correspondente.
+    - 'Tanto faz' em 'preferencia_genero' conta como dois filtros correspondentes.
+    - 'numero_maximo_pessoas' corresponde quando o valor da moradia é menor ou igual ao do universitário.
+    - 'preferencia_genero', 'frequencia_fumo' e 'frequencia_bebida' correspondem quando são iguais.
+
+    Args:
+        housing_profile (MatchProfile): Perfil do usuário de moradia.
+        university_profile (MatchProfile): Perfil do usuário universitário.
+
+    Returns:
+        float: Percentual de correspondência entre os dois perfis.
+    """
+    if housing_profile.allergy or university_profile.allergy:
+        return 0.0
+
+    # preferencia_genero, numero_maximo_pessoas, frequencia_fumo e frequencia_bebida
+    total_filters = 4
+    matched_filters = 0
+
+    if housing_profile.pet_lover or university_profile.pet_lover:
+        total_filters += 1
+        matched_filters += 1
+
+    if housing_profile.gender == GENDER_ANY_CODE or university_profile.gender == GENDER_ANY_CODE:
+        total_filters += 1
+        matched_filters += 2
+    elif housing_profile.gender == university_profile.gender:
+        matched_filters += 1
+
+    if (housing_profile.max_people is not None and university_profile.max_people is not None
+            and housing_profile.max_people <= university_profile.max_people):
+        matched_filters += 1
+
+    if housing_profile.smoking == university_profile.smoking:
+        matched_filters += 1
+
+    if housing_profile.drinking == university_profile.drinking:
+        matched_filters += 1
+
+    return (matched_filters / total_filters) * 100
+
+def calculate_match_percentage(housing_filters: dict, university_filters: dict) -> float:
+    """
+    Calcula o percentual de correspondência entre dois conjuntos de filtros, aplicando regras especiais.
+
+    Os dicionários recebidos não são alterados. Para calcular vários percentuais com o mesmo
+    universitário, prefira compile_profile() uma única vez e score_profiles() para cada moradia.
+
+    Args:
+        housing_filters (dict): Dicionário de filtros do usuário de moradia.
+        university_filters (dict): Dicionário de filtros do usuário universitário.
+
+    Returns:
+        float: Percentual de correspondência entre os dois conjuntos de filtros.
+    """
+    try:
+        match_percentage = score_profiles(compile_profile(housing_filters), compile_profile(university_filters))
+        logger.debug("Percentual de correspondência calculado: %s%%", match_percentage)
+        return match_percentage
+    except Exception as e:
+        logger.error(f"Ocorreu um erro ao calcular a correspondência: {e}")
+        return 0.0
+
+class HouseMatrix(NamedTuple):
+    """
+    Perfis de moradias codificados como arrays NumPy para o cálculo vetorizado.
+
+    Moradias com perfis iguais formam um grupo, e os arrays de campos têm um elemento por grupo,
+    de forma que cada perfil distinto é calculado uma única vez. 'group_index' indica, para cada
+    moradia, a posição do seu grupo. Os campos categóricos guardam os códigos de CATEGORY_CODES.
+    """
+    allergy: np.ndarray
+    pet_lover: np.ndarray
+    gender_any: np.ndarray
+    gender: np.ndarray
+    max_people: np.ndarray
+    max_people_valid: np.ndarray
+    smoking: np.ndarray
+    drinking: np.ndarray
+    group_index: np.ndarray
+
+_INT64_MIN = int(np.iinfo(np.int64).min)
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+def _clamp_int64(value: int) -> int:
+    """Limita um inteiro ao intervalo de np.int64, preservando as comparações com valores usuais."""
+    return min(max(value, _INT64_MIN), _INT64_MAX)
+
+def encode_profiles(profiles: list) -> HouseMatrix:
+    """
+    Codifica uma lista de perfis de moradias em um HouseMatrix.
+
+    Args:
+        profiles (list): Lista de MatchProfile das moradias.
+
+    Returns:
+        HouseMatrix: Os perfis codificados. 'group_index' segue a ordem da lista recebida.
+    """
+    groups = {}
+    group_index = [groups.setdefault(profile, len(groups)) for profile in profiles]
+    profiles = list(groups)
+
+    return HouseMatrix(
+        allergy=np.array([profile.allergy for profile in profiles], dtype=bool),
+        pet_lover=np.array([profile.pet_lover for profile in profiles], dtype=bool),
+        gender_any=np.array([profile.gender == GENDER_ANY_CODE for profile in profiles], dtype=bool),
+        gender=np.array([profile.gender for profile in profiles], dtype=np.int64),
+        max_people=np.array(
+            [_clamp_int64(profile.max_people) if profile.max_people is not None else 0 for profile in profiles],
+            dtype=np.int64
+        ),
+        max_people_valid=np.array([profile.max_people is not None for profile in profiles], dtype=bool),
+        smoking=np.array([profile.smoking for profile in profiles], dtype=np.int64),
+        drinking=np.array([profile.drinking for profile in profiles], dtype=np.int64),
+        group_index=np.array(group_index, dtype=np.intp)
+    )
+
+def score_groups(houses: HouseMatrix, university_profile: MatchProfile) -> np.ndarray:
+    """
+    Calcula, em operações vetorizadas, o percentual de correspondência de um universitário com cada grupo de moradias.
+
+    Aplica exatamente as mesmas regras de score_profiles() e produz os mesmos valores. O array retornado
+    é somente leitura, para que possa ser memorizado e compartilhado entre requisições.
+
+    Args:
+        houses (HouseMatrix): Perfis das moradias codificados por encode_profiles().
+        university_profile (MatchProfile): Perfil do usuário universitário.
+
+    Returns:
+        np.ndarray: Array de float64 com o percentual de cada grupo de perfis de 'houses'.
+    """
+    if university_profile.allergy:
+        percentages = np.zeros(len(houses.allergy), dtype=np.float64)
+        percentages.flags.writeable = False
+        return percentages
+
+    pet_lover = houses.pet_lover | university_profile.pet_lover
+    gender_any = houses.gender_any | (university_profile.gender == GENDER_ANY_CODE)
+
+    matched_filters = pet_lover.astype(np.int64)
+    matched_filters += np.where(gender_any, 2, houses.gender == university_profile.gender)
+    if university_profile.max_people is not None:
+        matched_filters += houses.max_people_valid & (
+            houses.max_people <= _clamp_int64(university_profile.max_people)
+        )
+    matched_filters += houses.smoking == university_profile.smoking
+    matched_filters += houses.drinking == university_profile.drinking
+
+    total_filters = 4 + pet_lover.astype(np.int64) + gender_any
+
+    percentages = (matched_filters / total_filters) * 100
+    percentages[houses.allergy] = 0.0
+    percentages.flags.writeable = False
+    return percentages
+
+def batch_match_percentages(houses: HouseMatrix, university_profile: MatchProfile) -> np.ndarray:
+    """
+    Calcula, em operações vetorizadas, o percentual de correspondência de um universitário com todas as moradias.
+
+    Cada grupo de perfis iguais é calculado uma única vez por score_groups() e o resultado é
+    distribuído para as moradias do grupo.
+
+    Args:
+        houses (HouseMatrix): Perfis das moradias codificados por encode_profiles().
+        university_profile (MatchProfile): Perfil do usuário universitário.
+
+    Returns:
+        np.ndarray: Array de float64 com o percentual de cada moradia, na ordem usada em encode_profiles().
+    """
+    return score_groups(houses, university_profile)[houses.group_index]
+
+def score_group_matrix(houses: HouseMatrix, students: HouseMatrix) -> np.ndarray:
+    """
+    Calcula, em operações vetorizadas, a matriz de percentuais entre grupos de universitários e grupos de moradias.
+
+    Aplica as mesmas regras de score_groups(): a linha i é igual a score_groups(houses, perfil do grupo i).
+
+    Args:
+        houses (HouseMatrix): Perfis das moradias codificados por encode_profiles().
+        students (HouseMatrix): Perfis dos universitários, também codificados por encode_profiles().
+
+    Returns:
+        np.ndarray: Array de float64 com forma (grupos de universitários, grupos de moradias).
+    """
+    pet_lover = students.pet_lover[:, None] | houses.pet_lover
+    gender_any = students.gender_any[:, None] | houses.gender_any
+
+    matched_filters = pet_lover.astype(np.int64)
+    matched_filters += np.where(gender_any, 2, students.gender[:, None] == houses.gender)
+    matched_filters += (students.max_people_valid[:, None] & houses.max_people_valid
+                        & (houses.max_people <= students.max_people[:, None]))
+    matched_filters += students.smoking[:, None] == houses.smoking
+    matched_filters += students.drinking[:, None] == houses.drinking
+
+    total_filters = 4 + pet_lover.astype(np.int64) + gender_any
+
+    percentages = (matched_filters / total_filters) * 100
+    percentages[students.allergy[:, None] | houses.allergy] = 0.0
+    return percentages
+
+def catalogue_projection(extra_fields: tuple = ()) -> dict:
+    """
+    Retorna a projeção da consulta do catálogo de moradias.
+
+    O '_id' é projetado para localizar no catálogo a moradia de um evento de remoção do change stream.
+    Sem campos adicionais, todos os campos projetados pertencem ao índice CATALOGUE_INDEX, o que
+    permite ao MongoDB responder à consulta apenas com o índice (consulta coberta).
+    """
+    projection = {'_id': 1, 'idUsuarioMoradia': 1}
+    projection.update({field: 1 for field in FILTER_FIELDS + list(extra_fields)})
+    return projection
+
+def fetch_house_filters(query: Optional[dict] = None, extra_fields: tuple = (),
+                        document_ids: Optional[dict] = None) -> dict:
+    """
+    Busca os filtros das moradias que satisfazem a consulta, usando um único cursor projetado.
+
+    Ao contrário de get_all_house_filters(), erros do MongoDB são propagados, para que o
+    catálogo de moradias nunca substitua os dados em memória por um resultado vazio.
+
+    Args:
+        query (dict, opcional): Condições adicionais à condição {'tipo': 'moradia'}.
+        extra_fields (tuple, opcional): Campos adicionais a incluir na projeção e no dicionário retornado.
+        document_ids (dict, opcional): Se informado, recebe o '_id' do documento de cada moradia retornada,
+            indexado pelo UUID em bytes.
+
+    Returns:
+        dict: Um dicionário cujas chaves são os UUIDs das moradias em 16 bytes brutos e cujos valores
+        são os dicionários de filtros, no mesmo formato retornado por get_filters().
+    """
+    cursor = get_collection().find({'tipo': 'moradia', **(query or {})}, catalogue_projection(extra_fields))
+    logger.debug("Consulta MongoDB realizada com sucesso.")
+
+    houses = {}
+    for document in cursor:
+        binary_uuid = document.get('idUsuarioMoradia')
+        if not binary_uuid:
+            continue
+        if not isinstance(binary_uuid, bytes) or len(binary_uuid) != 16:
+            logger.error(f"Erro ao converter UUID: {binary_uuid!r} não tem 16 bytes.")
+            continue
+        filters = extract_filters(document)
+        for field in extra_fields:
+            filters[field] = document.get(field)
+        houses[bytes(binary_uuid)] = filters
+        if document_ids is not None:
+            document_ids[bytes(binary_uuid)] = document.get('_id')
+
+    return houses
+
+def get_all_house_filters(query: Optional[dict] = None) -> dict:
+    """
+    Retorna os filtros de todas as moradias da coleção em uma única consulta ao MongoDB.
+
+    Usa um único cursor projetado, em vez de uma consulta find_one por moradia (N+1 consultas por requisição).
+
+    Args:
+        query (dict, opcional): Condições adicionais à condição {'tipo': 'moradia'}.
+
+    Returns:
+        dict: Um dicionário cujas chaves são os UUIDs das moradias em 16 bytes brutos e cujos valores
+        são os dicionários de filtros, no mesmo formato retornado por get_filters().
+    """
+    logger.debug("Obtendo os filtros de todas as moradias da coleção.")
+    try:
+        houses = fetch_house_filters(query)
+        logger.debug("Total de moradias encontradas: %d", len(houses))
+        return houses
+    except Exception as e:
+        logger.error(f"Ocorreu um erro ao buscar os filtros das moradias: {e}")
+        return {}
+
+# Índices exigidos pela aplicação: nome → (chaves, opções de create_index)
+CATALOGUE_INDEX = 'catalogo_moradias'
+USER_INDEX = 'usuario_unico'
+REQUIRED_INDEXES = {
+    # Atende o find_one de get_filters (um por requisição) sem percorrer a coleção.
+    USER_INDEX: ([('idUsuarioMoradia', ASCENDING)], {'unique': True}),
+    # Cobre a consulta do catálogo: filtro em 'tipo' e projeção de 'idUsuarioMoradia', dos campos de filtro
+    # e do '_id'. A consulta só é coberta se nenhum dos campos for um array em algum documento (índice multikey).
+    CATALOGUE_INDEX: (
+        [('tipo', ASCENDING), ('idUsuarioMoradia', ASCENDING)] + [(field, ASCENDING) for field in FILTER_FIELDS]
+        + [('_id', ASCENDING)],
+        {}
+    )
+}
+
+def check_indexes(create: bool = False) -> dict:
+    """
+    Verifica se os índices de REQUIRED_INDEXES existem na coleção e, opcionalmente, cria os que faltam.
+
+    Um índice existente é aceito se tiver as mesmas chaves e opções, independentemente do nome. Um índice
+    com o nome exigido e outras chaves (ex: de uma versão anterior) é reportado como 'mismatch' e precisa
+    ser removido com dropIndex para ser recriado.
+
+    Args:
+        create (bool, opcional): Se True, cria os índices ausentes.
+
+    Returns:
+        dict: Um dicionário nome → situação ('ok', 'created', 'missing' ou 'mismatch').
+    """
+    collection = get_collection()
+    existing = collection.index_information()
+    status = {}
+    for name, (keys, options) in REQUIRED_INDEXES.items():
+        matches = [info for info in existing.values() if [tuple(key) for key in info['key']] == keys]
+        if any(all(info.get(option) == value for option, value in options.items()) for info in matches):
+            status[name] = 'ok'
+        elif matches or name in existing:
+            status[name] = 'mismatch'
+        elif create:
+            collection.create_index(keys, name=name, **options)
+            status[name] = 'created'
+        else:
+            status[name] = 'missing'
+        log = logger.info if status[name] in ('ok', 'created') else logger.warning
+        log(f"Índice '{name}': {status[name]}.")
+    return status
+
+def _plan_stages(plan: Any) -> list:
+    """Retorna os nomes dos estágios de um plano de execução do MongoDB, do mais externo ao mais interno."""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for key in ('queryPlan', 'inputStage'):
+            stages.extend(_plan_stages(plan.get(key)))
+        for child in plan.get('inputStages', []):
+            stages.extend(_plan_stages(child))
+    return stages
+
+def explain_catalogue_query() -> dict:
+    """
+    Executa explain() na consulta do catálogo de moradias e resume as estatísticas de execução.
+
+    Returns:
+        dict: Estágios do plano vencedor, documentos retornados, documentos e chaves examinados,
+        tempo de execução e se a consulta foi coberta pelo índice (nenhum documento examinado).
+    """
+    plan = get_collection().find({'tipo': 'moradia'}, catalogue_projection()).explain()
+    stats = plan.get('executionStats', {})
+    stages = _plan_stages(plan.get('queryPlanner', {}).get('winningPlan'))
+    return {
+        'stages': stages,
+        'returned': stats.get('nReturned'),
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'execution_time_ms': stats.get('executionTimeMillis'),
+        'covered': 'COLLSCAN' not in stages and stats.get('totalDocsExamined') == 0
+    }
+
+def check_user_lookup(samples: int = 5) -> dict:
+    """
+    Mede a latência da busca de um usuário por 'idUsuarioMoradia', a mesma feita por get_filters.
+
+    Usa o 'idUsuarioMoradia' de um documento qualquer da coleção e executa a busca 'samples' vezes.
+
+    Args:
+        samples (int, opcional): Número de buscas cronometradas.
+
+    Returns:
+        dict: Latências média e máxima em milissegundos, estágios do plano vencedor e documentos
+        examinados por busca, ou um dicionário vazio se a coleção não tiver usuários.
+    """
+    collection = get_collection()
+    document = collection.find_one({'idUsuarioMoradia': {'$exists': True}}, {'idUsuarioMoradia': 1, '_id': 0})
+    if not document:
+        return {}
+    query = {'idUsuarioMoradia': document['idUsuarioMoradia']}
+
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        collection.find_one(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    plan = collection.find(query).limit(1).explain()
+    return {
+        'samples': samples,
+        'avg_ms': round(sum(latencies) / samples, 3),
+        'max_ms': round(max(latencies), 3),
+        'stages': _plan_stages(plan.get('queryPlanner', {}).get('winningPlan')),
+        'docs_examined': plan.get('executionStats', {}).get('totalDocsExamined')
+    }
+
+def verify_mongo_setup(mode: str) -> None:
+    """
+    Verificação do MongoDB na inicialização: índices exigidos e latência da busca por usuário.
+
+    Args:
+        mode (str): 'verify' apenas registra avisos, 'ensure' cria os índices ausentes e 'require'
+            também cria os ausentes, mas impede a inicialização se algum índice continuar faltando
+            ou existir com opções diferentes (ex: não único). 'off' desativa a verificação.
+
+    Raises:
+        RuntimeError: No modo 'require', se algum índice exigido não estiver disponível.
+    """
+    if mode == 'off':
+        return
+    try:
+        status = check_indexes(create=mode in ('ensure', 'require'))
+    except Exception as e:
+        if mode == 'require':
+            raise RuntimeError(f"Não foi possível verificar os índices do MongoDB: {e}") from e
+        logger.warning(f"Não foi possível verificar os índices do MongoDB: {e}")
+        return
+
+    failed = [name for name, result in status.items() if result not in ('ok', 'created')]
+    if failed and mode == 'require':
+        raise RuntimeError(f"Índices exigidos ausentes ou divergentes: {', '.join(failed)}.")
+
+    try:
+        lookup = check_user_lookup()
+    except Exception as e:
+        logger.warning(f"Não foi possível medir a busca por usuário: {e}")
+        return
+    if lookup:
+        logger.info(f"Busca por usuário: média de {lookup['avg_ms']} ms, máximo de {lookup['max_ms']} ms "
+                    f"({lookup['samples']} buscas, plano {lookup['stages']}).")
+        if 'COLLSCAN' in lookup['stages']:
+            logger.warning("A busca por usuário percorre a coleção inteira (COLLSCAN). Execute 'flask ensure-indexes'.")
+
+# UUID armazenado como 16 bytes brutos nos arrays NumPy do catálogo
+UUID_DTYPE = np.dtype('V16')
+# '_id' (ObjectId) do documento de cada moradia, em 12 bytes brutos; zeros quando desconhecido
+OBJECT_ID_DTYPE = np.dtype('V12')
+_NO_OBJECT_ID = bytes(12)
+
+class ProfileVocabulary:
+    """
+    Tabela append-only dos perfis distintos de moradias, em que cada perfil recebe um código inteiro estável.
+
+    Como os códigos nunca mudam, colunas de códigos criadas em momentos diferentes podem ser comparadas
+    diretamente. A tabela cresce apenas com perfis nunca vistos, cujo número é limitado pelas
+    combinações dos campos de filtro, e não pelo número de moradias.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._codes = {}
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def intern(self, profile: MatchProfile) -> int:
+        """Retorna o código do perfil, incluindo-o na tabela se ainda não estiver nela."""
+        code = self._codes.get(profile)
+        if code is None:
+            code = len(self.profiles)
+            self.profiles.append(profile)
+            self._codes[profile] = code
+        return code
+
+class HouseColumns:
+    """
+    Armazenamento colunar e compacto das moradias do catálogo.
+
+    Cada moradia ocupa uma linha de três arrays paralelos: o UUID em 16 bytes brutos, o código do seu
+    perfil em um ProfileVocabulary e o '_id' do documento em 12 bytes, cerca de 50 bytes por moradia
+    contando os índices de busca (contra centenas de bytes de um dicionário de filtros com chaves e
+    valores em string). As linhas seguem a ordem de inserção, usada para desempatar as recomendações;
+    '_order' e '_id_order' mantêm as linhas ordenadas por UUID e por '_id' para buscas binárias.
+    Os raros '_id' que não são ObjectId ficam em um dicionário à parte.
+    """
+
+    def __init__(self, vocabulary: Optional[ProfileVocabulary] = None):
+        self.vocabulary = vocabulary if vocabulary is not None else ProfileVocabulary()
+        self._uuids = np.empty(0, dtype=UUID_DTYPE)
+        self._codes = np.empty(0, dtype=np.int32)
+        self._object_ids = np.empty(0, dtype=OBJECT_ID_DTYPE)
+        self._order = np.empty(0, dtype=np.intp)
+        self._id_order = np.empty(0, dtype=np.intp)
+        self._other_ids = {}
+        self._size = 0
+
+    @classmethod
+    def from_profiles(cls, profiles: dict, vocabulary: Optional[ProfileVocabulary] = None,
+                      document_ids: Optional[dict] = None) -> 'HouseColumns':
+        """
+        Cria as colunas a partir de um dicionário UUID (16 bytes) → MatchProfile, preservando a sua ordem.
+
+        Args:
+            profiles (dict): Perfis das moradias indexados pelos UUIDs em bytes.
+            vocabulary (ProfileVocabulary, opcional): Vocabulário de perfis a reutilizar.
+            document_ids (dict, opcional): '_id' do documento de cada moradia, indexado pelo UUID em bytes.
+        """
+        columns = cls(vocabulary)
+        intern = columns.vocabulary.intern
+        document_ids = document_ids or {}
+        columns._uuids = np.frombuffer(b''.join(profiles), dtype=UUID_DTYPE).copy()
+        columns._codes = np.fromiter((intern(profile) for profile in profiles.values()), dtype=np.int32,
+                                     count=len(profiles))
+        columns._object_ids = np.frombuffer(
+            b''.join(columns._object_id_key(document_ids.get(house_uuid)).tobytes() for house_uuid in profiles),
+            dtype=OBJECT_ID_DTYPE
+        ).copy()
+        columns._order = np.argsort(columns._uuids, kind='stable')
+        columns._id_order = np.argsort(columns._object_ids, kind='stable')
+        columns._other_ids = {
+            document_id: house_uuid for house_uuid, document_id in document_ids.items()
+            if house_uuid in profiles and columns._is_other_id(document_id)
+        }
+        columns._size = len(profiles)
+        return columns
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def uuids(self) -> np.ndarray:
+        """UUIDs das moradias (dtype UUID_DTYPE), na ordem do catálogo."""
+        return self._uuids[:self._size]
+
+    @property
+    def codes(self) -> np.ndarray:
+        """Códigos dos perfis das moradias no vocabulário, na ordem do catálogo."""
+        return self._codes[:self._size]
+
+    def same_as(self, other: 'HouseColumns') -> bool:
+        """Indica se as duas colunas têm as mesmas moradias, na mesma ordem e com os mesmos perfis."""
+        return (self.vocabulary is other.vocabulary and np.array_equal(self.uuids, other.uuids)
+                and np.array_equal(self.codes, other.codes))
+
+    def _key(self, house_uuid: bytes) -> np.ndarray:
+        return np.frombuffer(house_uuid, dtype=UUID_DTYPE)
+
+    @staticmethod
+    def _object_id_key(document_id: Any) -> np.ndarray:
+        binary = document_id.binary if isinstance(document_id, ObjectId) else _NO_OBJECT_ID
+        return np.frombuffer(binary, dtype=OBJECT_ID_DTYPE)
+
+    @staticmethod
+    def _is_other_id(document_id: Any) -> bool:
+        return document_id is not None and not isinstance(document_id, ObjectId) and isinstance(document_id, Hashable)
+
+    def find(self, house_uuid: bytes) -> int:
+        """Retorna a linha da moradia com o UUID informado (16 bytes), ou -1 se ela não estiver no catálogo."""
+        position = int(np.searchsorted(self.uuids, self._key(house_uuid), sorter=self._order)[0])
+        if position < self._size:
+            row = int(self._order[position])
+            if self._uuids[row] == self._key(house_uuid)[0]:
+                return row
+        return -1
+
+    def find_document(self, document_id: Any) -> int:
+        """Retorna a linha da moradia cujo documento tem o '_id' informado, ou -1 se ela não estiver no catálogo."""
+        if not isinstance(document_id, ObjectId):
+            house_uuid = self._other_ids.get(document_id) if self._is_other_id(document_id) else None
+            return self.find(house_uuid) if house_uuid is not None else -1
+        key = self._object_id_key(document_id)
+        position = int(np.searchsorted(self._object_ids[:self._size], key, sorter=self._id_order)[0])
+        if position < self._size:
+            row = int(self._id_order[position])
+            if self._object_ids[row] == key[0]:
+                return row
+        return -1
+
+    def set(self, house_uuid: bytes, profile: MatchProfile, document_id: Any = None) -> bool:
+        """
+        Insere ou atualiza o perfil de uma moradia. Moradias novas entram no fim da ordem do catálogo.
+
+        Args:
+            house_uuid (bytes): UUID da moradia em 16 bytes.
+            profile (MatchProfile): Perfil da moradia.
+            document_id (opcional): '_id' do documento da moradia. Se None, o '_id' conhecido é mantido.
+
+        Returns:
+            bool: True se o UUID ou o perfil de alguma moradia mudou (mudanças de '_id' não contam).
+        """
+        code = self.vocabulary.intern(profile)
+        row = self.find(house_uuid)
+        if row >= 0:
+            if document_id is not None:
+                self._set_document_id(row, house_uuid, document_id)
+            if self._codes[row] == code:
+                return False
+            self._codes[row] = code
+            return True
+
+        if self._size == len(self._uuids):
+            # Crescimento geométrico, para que inserções sucessivas tenham custo amortizado constante
+            capacity = max(16, 2 * self._size)
+            self._uuids = np.resize(self._uuids, capacity)
+            self._codes = np.resize(self._codes, capacity)
+            self._object_ids = np.resize(self._object_ids, capacity)
+        row = self._size
+        object_id = self._object_id_key(document_id)
+        self._uuids[row] = self._key(house_uuid)[0]
+        self._codes[row] = code
+        self._object_ids[row] = object_id[0]
+        position = np.searchsorted(self.uuids, self._key(house_uuid), sorter=self._order)[0]
+        self._order = np.insert(self._order, position, row)
+        position = np.searchsorted(self._object_ids[:self._size], object_id, sorter=self._id_order)[0]
+        self._id_order = np.insert(self._id_order, position, row)
+        if self._is_other_id(document_id):
+            self._other_ids[document_id] = house_uuid
+        self._size += 1
+        return True
+
+    def _set_document_id(self, row: int, house_uuid: bytes, document_id: Any) -> None:
+        self._discard_other_id(house_uuid)
+        object_id = self._object_id_key(document_id)
+        if self._object_ids[row] != object_id[0]:
+            # Raro: o documento da moradia foi substituído por outro, com outro '_id'
+            self._object_ids[row] = object_id[0]
+            self._id_order = np.argsort(self._object_ids[:self._size], kind='stable')
+        if self._is_other_id(document_id):
+            self._other_ids[document_id] = house_uuid
+
+    def _discard_other_id(self, house_uuid: bytes) -> None:
+        if self._other_ids:
+            self._other_ids = {key: value for key, value in self._other_ids.items() if value != house_uuid}
+
+    def remove(self, house_uuid: bytes) -> bool:
+        """
+        Remove uma moradia, preservando a ordem das demais.
+
+        Returns:
+            bool: True se a moradia estava nas colunas.
+        """
+        row = self.find(house_uuid)
+        if row < 0:
+            return False
+        self._uuids = np.delete(self.uuids, row)
+        self._codes = np.delete(self.codes, row)
+        self._object_ids = np.delete(self._object_ids[:self._size], row)
+        self._order = self._order[self._order != row]
+        self._order[self._order > row] -= 1
+        self._id_order = self._id_order[self._id_order != row]
+        self._id_order[self._id_order > row] -= 1
+        self._discard_other_id(house_uuid)
+        self._size -= 1
+        return True
+
+    def nbytes(self) -> int:
+        """Retorna a memória ocupada pelos arrays das colunas, em bytes (sem o vocabulário)."""
+        return (self._uuids.nbytes + self._codes.nbytes + self._object_ids.nbytes
+                + self._order.nbytes + self._id_order.nbytes)
+
+def format_uuid(house_uuid: Any) -> str:
+    """Formata um UUID de 16 bytes (bytes ou elemento de um array UUID_DTYPE) no formato padrão."""
+    return str(uuid.UUID(bytes=bytes(house_uuid)))
+
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+# Posições dos 32 dígitos hexadecimais nos 36 caracteres do formato padrão (os demais são hífens)
+_UUID_DIGIT_POSITIONS = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+
+def format_uuids(uuids: np.ndarray) -> list:
+    """
+    Formata em lote um array de UUIDs de 16 bytes (dtype UUID_DTYPE) no formato padrão.
+
+    A conversão para hexadecimal é feita em operações vetorizadas sobre todos os UUIDs de uma vez,
+    sem criar um uuid.UUID por elemento.
+
+    Args:
+        uuids (np.ndarray): Os UUIDs em 16 bytes brutos.
+
+    Returns:
+        list: Os UUIDs como strings (ex: '592f7f4a-ebd2-4b3a-7e46-7e1af20de594'), na mesma ordem.
+    """
+    raw = np.ascontiguousarray(uuids, dtype=UUID_DTYPE).view(np.uint8).reshape(-1, 16)
+    digits = np.empty((len(raw), 32), dtype=np.uint8)
+    digits[:, 0::2] = _HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = _HEX_DIGITS[raw & 0x0F]
+    text = np.full((len(raw), 36), ord('-'), dtype=np.uint8)
+    text[:, _UUID_DIGIT_POSITIONS] = digits
+    text = text.tobytes().decode('ascii')
+    return [text[start:start + 36] for start in range(0, len(text), 36)]
+
+class CatalogueSnapshot(NamedTuple):
+    """
+    Visão imutável do catálogo de moradias em uma determinada versão.
+
+    'uuids' é uma cópia da coluna de UUIDs (16 bytes por moradia) e 'matrix' codifica os perfis do
+    vocabulário do catálogo, com a coluna de códigos como 'group_index'. 'group_scores' é score_groups()
+    aplicado a 'matrix' e memorizado por perfil de universitário: universitários com filtros iguais
+    reaproveitam os percentuais já calculados nesta versão.
+    """
+    version: int
+    uuids: np.ndarray
+    matrix: HouseMatrix
+    group_scores: Callable[[MatchProfile], np.ndarray]
+
+    def match_percentages(self, university_profile: MatchProfile) -> np.ndarray:
+        """Retorna o percentual de correspondência de um universitário com cada moradia de 'uuids'."""
+        return self.group_scores(university_profile)[self.matrix.group_index]
+
+class HouseCatalogue:
+    """
+    Catálogo residente dos perfis das moradias, carregado na inicialização e mantido atualizado em segundo plano.
+
+    A sincronização usa um change stream do MongoDB quando o servidor oferece suporte (replica set
+    ou cluster). Caso contrário, recorre a consultas periódicas: incrementais, quando um campo de
+    data de atualização é configurado em CATALOGUE_UPDATED_AT_FIELD, ou recargas completas.
+
+    Variáveis de ambiente:
+        CATALOGUE_SYNC_MODE: 'auto' (change stream com fallback para consultas periódicas),
+            'polling' (apenas consultas periódicas) ou 'off' (sem catálogo residente). Padrão: 'auto'.
+        CATALOGUE_POLL_INTERVAL: Intervalo, em segundos, entre as consultas periódicas. Padrão: 30.
+        CATALOGUE_UPDATED_AT_FIELD: Campo com a data da última atualização do documento. Padrão: vazio.
+        CATALOGUE_FULL_REFRESH_INTERVAL: Intervalo, em segundos, entre recargas completas quando as
+            consultas periódicas são incrementais (necessárias para detectar remoções). Padrão: 3600.
+        CATALOGUE_STARTUP_TIMEOUT: Tempo máximo, em segundos, de espera pela carga inicial em start(wait=True). Padrão: 30.
+    """
+
+    # Código retornado pelo MongoDB quando change streams não são suportados (servidor standalone)
+    CHANGE_STREAM_UNSUPPORTED_CODES = (40573,)
+
+    def __init__(self):
+        self.sync_mode = getenv('CATALOGUE_SYNC_MODE', 'auto')
+        self.poll_interval = float(getenv('CATALOGUE_POLL_INTERVAL', 30))
+        self.updated_at_field = getenv('CATALOGUE_UPDATED_AT_FIELD') or None
+        self.full_refresh_interval = float(getenv('CATALOGUE_FULL_REFRESH_INTERVAL', 3600))
+        self.startup_timeout = float(getenv('CATALOGUE_STARTUP_TIMEOUT', 30))
+
+        self._lock = threading.Lock()
+        # Serializa as escritas da sincronização (recargas, eventos do change stream e consultas periódicas),
+        # para que uma recarga não substitua as colunas por dados anteriores a uma alteração já aplicada
+        self._sync_lock = threading.RLock()
+        self._columns = HouseColumns()
+        self._version = 0
+        self._snapshot = None
+        self._vocabulary_matrix = None
+        self._malformed = {}
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._active_mode = 'stopped'
+        self._last_sync = None
+        self._last_full_refresh = None
+        self._watermark = None
+        self._resume_token = None
+        self._change_listeners = []
+        self._start_lock = threading.Lock()
+        self._sync_requested = False
+        self._resume_pending = False
+
+    # Leitura
+
+    def snapshot(self) -> Optional[CatalogueSnapshot]:
+        """
+        Retorna a visão atual do catálogo, codificando os perfis apenas quando a versão muda.
+
+        Returns:
+            CatalogueSnapshot | None: A visão do catálogo, ou None se o catálogo ainda não foi carregado.
+        """
+        if self._resume_pending:
+            self._resume_after_fork()
+        if not self._loaded.is_set():
+            return None
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != self._version:
+                profiles = self._columns.vocabulary.profiles
+                if self._vocabulary_matrix is None or len(self._vocabulary_matrix.allergy) != len(profiles):
+                    # O vocabulário não tem perfis repetidos: o grupo de cada perfil é o seu próprio código
+                    self._vocabulary_matrix = encode_profiles(profiles)
+                matrix = self._vocabulary_matrix._replace(group_index=self._columns.codes.copy())
+                group_scores = lru_cache(maxsize=SCORE_MEMO_MAXSIZE)(partial(score_groups, matrix))
+                self._snapshot = CatalogueSnapshot(self._version, self._columns.uuids.copy(), matrix, group_scores)
+            return self._snapshot
+
+    def size(self) -> int:
+        """Retorna o número de moradias no catálogo."""
+        return len(self._columns)
+
+    def staleness(self) -> Optional[float]:
+        """Retorna quantos segundos se passaram desde a última sincronização confirmada com o MongoDB."""
+        if self._last_sync is None:
+            return None
+        return time.monotonic() - self._last_sync
+
+    def stats(self) -> dict:
+        """Retorna as métricas do catálogo."""
+        staleness = self.staleness()
+        return {
+            'loaded': self._loaded.is_set(),
+            'size': self.size(),
+            'distinct_profiles': len(self._columns.vocabulary),
+            'memory_bytes': self._columns.nbytes(),
+            'malformed': self._malformed,
+            'version': self._version,
+            'sync_mode': self._active_mode,
+            'staleness_seconds': round(staleness, 3) if staleness is not None else None
+        }
+
+    def add_change_listener(self, listener) -> None:
+        """
+        Registra uma função chamada com o UUID (str) de cada usuário cujo documento muda no change stream.
+
+        Alterações de universitários não afetam o catálogo, mas são repassadas aos ouvintes (por
+        exemplo, para invalidar recomendações em cache). No modo de consultas periódicas nenhum
+        ouvinte é chamado.
+        """
+        self._change_listeners.append(listener)
+
+    # Escrita
+
+    def refresh(self) -> int:
+        """
+        Recarrega o catálogo completo a partir do MongoDB.
+
+        A consulta e a troca das colunas são feitas sob o lock de sincronização: eventos do change
+        stream e consultas periódicas que chegam durante a recarga aguardam e são aplicados depois dela.
+
+        Returns:
+            int: O número de moradias carregadas.
+
+        Raises:
+            Exception: Erros do MongoDB são propagados e o catálogo atual é mantido.
+        """
+        with self._sync_lock:
+            extra_fields = (self.updated_at_field,) if self.updated_at_field else ()
+            document_ids = {}
+            houses = fetch_house_filters(extra_fields=extra_fields, document_ids=document_ids)
+            # Normalização única de cada moradia, contando os registros com campos inválidos
+            malformed = Counter()
+            profiles = {house_uuid: compile_profile(filters, malformed) for house_uuid, filters in houses.items()}
+            if malformed:
+                logger.warning(f"{malformed['records']} moradias com campos inválidos no catálogo: {dict(malformed)}")
+            with self._lock:
+                columns = HouseColumns.from_profiles(profiles, self._columns.vocabulary, document_ids)
+                if not columns.same_as(self._columns):
+                    self._version += 1
+                # As colunas são substituídas mesmo sem mudança de versão, para atualizar os '_id' das moradias
+                self._columns = columns
+                if self.updated_at_field:
+                    self._watermark = self._max_updated_at(houses.values(), None)
+                self._malformed = dict(malformed)
+            self._last_full_refresh = time.monotonic()
+            self._publish_size()
+            self._mark_synced()
+        self._loaded.set()
+        logger.info(f"Catálogo de moradias carregado com {len(profiles)} moradias.")
+        return len(profiles)
+
+    def upsert(self, house_uuid: bytes, filters: dict, document_id: Any = None) -> None:
+        """Insere ou atualiza o perfil de uma moradia, identificada pelo UUID em 16 bytes e, opcionalmente, pelo '_id'."""
+        profile = compile_profile(filters)
+        with self._lock:
+            if self._columns.set(house_uuid, profile, document_id):
+                self._version += 1
+        self._publish_size()
+
+    def remove(self, house_uuid: bytes) -> None:
+        """Remove uma moradia do catálogo, identificada pelo UUID em 16 bytes, se presente."""
+        with self._lock:
+            if self._columns.remove(house_uuid):
+                self._version += 1
+        self._publish_size()
+
+    def remove_document(self, document_id: Any) -> Optional[bytes]:
+        """
+        Remove a moradia cujo documento tem o '_id' informado, se ela estiver no catálogo.
+
+        Returns:
+            bytes | None: O UUID da moradia removida, ou None se o '_id' não é de uma moradia conhecida.
+        """
+        with self._lock:
+            row = self._columns.find_document(document_id)
+            if row < 0:
+                return None
+            house_uuid = bytes(self._columns.uuids[row])
+            self._columns.remove(house_uuid)
+            self._version += 1
+        self._publish_size()
+        return house_uuid
+
+    def _publish_size(self) -> None:
+        CATALOGUE_HOUSES.set(len(self._columns))
+        CATALOGUE_PROFILES.set(len(self._columns.vocabulary))
+
+    def _mark_synced(self) -> None:
+        self._last_sync = time.monotonic()
+        CATALOGUE_LAST_SYNC.set_to_current_time()
+
+    def _max_updated_at(self, documents, current):
+        for document in documents:
+            value = document.get(self.updated_at_field)
+            if value is not None and (current is None or value > current):
+                current = value
+        return current
+
+    # Sincronização em segundo plano
+
+    def start(self, wait: bool = False) -> None:
+        """
+        Inicia a sincronização em segundo plano, cuja primeira etapa é a carga completa do catálogo.
+
+        Enquanto a carga não termina, snapshot() retorna None e as requisições consultam o MongoDB diretamente.
+
+        Args:
+            wait (bool, opcional): Se True, aguarda a carga inicial por até CATALOGUE_STARTUP_TIMEOUT segundos
+                (usado pelo mestre do Gunicorn com preload, para que os workers herdem o catálogo carregado).
+        """
+        if self.sync_mode == 'off':
+            logger.info("Catálogo residente de moradias desativado (CATALOGUE_SYNC_MODE=off).")
+            return
+        with self._start_lock:
+            self._resume_pending = False
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._sync_requested = True
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='house-catalogue-sync', daemon=True)
+            self._thread.start()
+        if wait and not self._loaded.wait(self.startup_timeout):
+            logger.warning("Catálogo de moradias não foi carregado a tempo. As requisições consultarão o MongoDB diretamente.")
+
+    def stop(self) -> None:
+        """Interrompe a sincronização em segundo plano."""
+        self._sync_requested = False
+        self._resume_pending = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._active_mode = 'stopped'
+
+    def reinit_after_fork(self) -> None:
+        """
+        Prepara o catálogo herdado por um processo filho criado por fork.
+
+        Os perfis carregados pelo processo pai são mantidos, mas a thread de sincronização não existe
+        no filho e os locks podem ter sido copiados em uso. Os locks e eventos são recriados e a
+        sincronização é retomada na próxima chamada de snapshot() (ou de resume_after_fork()), a
+        partir do mesmo ponto do change stream em que o processo pai estava.
+        """
+        loaded = self._loaded.is_set()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.RLock()
+        self._start_lock = threading.Lock()
+        self._loaded = threading.Event()
+        if loaded:
+            self._loaded.set()
+        self._stop = threading.Event()
+        self._thread = None
+        self._active_mode = 'stopped'
+        self._resume_pending = self._sync_requested
+
+    def resume_after_fork(self) -> None:
+        """Retoma imediatamente a sincronização interrompida por um fork, se houver uma pendente."""
+        if self._resume_pending:
+            self._resume_after_fork()
+
+    def _resume_after_fork(self) -> None:
+        logger.info("Retomando a sincronização do catálogo de moradias no processo filho.")
+        self.start()
+
+    def _run(self) -> None:
+        use_change_stream = self.sync_mode == 'auto'
+        while not self._stop.is_set():
+            try:
+                if use_change_stream:
+                    self._follow_change_stream()
+                else:
+                    self._poll()
+                    self._stop.wait(self.poll_interval)
+            except (OperationFailure, NotImplementedError) as e:
+                if use_change_stream and self._resume_token is None and (
+                    isinstance(e, NotImplementedError) or e.code in self.CHANGE_STREAM_UNSUPPORTED_CODES
+                ):
+                    logger.warning(f"Change streams indisponíveis ({e}). Usando consultas periódicas para o catálogo.")
+                    use_change_stream = False
+                else:
+                    logger.error(f"Erro na sincronização do catálogo de moradias: {e}")
+                    # O histórico do change stream pode não conter mais o ponto de retomada
+                    self._resume_token = None
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Erro na sincronização do catálogo de moradias: {e}")
+                self._stop.wait(self.poll_interval)
+
+    def _follow_change_stream(self) -> None:
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}}]
+        with get_collection().watch(
+            pipeline, full_document='updateLookup', resume_after=self._resume_token, max_await_time_ms=1000
+        ) as stream:
+            self._active_mode = 'change_stream'
+            if self._resume_token is None:
+                # O stream é aberto antes da carga para que nenhuma alteração feita durante ela seja perdida
+                self.refresh()
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self._apply_change(change)
+                self._resume_token = stream.resume_token
+                self._mark_synced()
+        # O stream foi invalidado (coleção removida ou renomeada): recomeça com uma carga completa
+        self._resume_token = None
+
+    def _apply_change(self, change: dict) -> None:
+        with self._sync_lock:
+            house_uuid = self._apply_change_locked(change)
+        if house_uuid is not None:
+            for listener in self._change_listeners:
+                listener(str(house_uuid))
+
+    def _apply_change_locked(self, change: dict) -> Optional[uuid.UUID]:
+        """Aplica um evento do change stream e retorna o UUID do usuário alterado, ou None se o evento foi ignorado."""
+        if change['operationType'] == 'delete':
+            # Eventos de remoção trazem apenas o _id: remoções de universitários (ou de _ids desconhecidos) são ignoradas
+            removed = self.remove_document(change['documentKey']['_id'])
+            if removed is None:
+                return None
+            house_uuid = uuid.UUID(bytes=removed)
+        else:
+            document = change.get('fullDocument')
+            if not document or not document.get('idUsuarioMoradia'):
+                return None
+            try:
+                house_uuid = uuid.UUID(bytes=document['idUsuarioMoradia'])
+            except (ValueError, TypeError) as e:
+                logger.error(f"Erro ao converter UUID: {e}")
+                return None
+            if document.get('tipo') == 'moradia':
+                try:
+                    self.upsert(house_uuid.bytes, extract_filters(document), document.get('_id'))
+                except Exception as e:
+                    # Um registro que não pode ser compilado não deve travar o change stream no mesmo ponto de retomada
+                    logger.error(f"Erro ao aplicar a alteração da moradia {house_uuid}; registro ignorado: {e}")
+                    return None
+            else:
+                self.remove(house_uuid.bytes)
+        return house_uuid
+
+    def _poll(self) -> None:
+        self._active_mode = 'polling'
+        with self._sync_lock:
+            incremental = (
+                self.updated_at_field
+                and self._watermark is not None
+                and time.monotonic() - self._last_full_refresh < self.full_refresh_interval
+            )
+            if not incremental:
+                self.refresh()
+                return
+            document_ids = {}
+            houses = fetch_house_filters(
+                {self.updated_at_field: {'$gt': self._watermark}}, (self.updated_at_field,), document_ids
+            )
+            for house_uuid, filters in houses.items():
+                self.upsert(house_uuid, filters, document_ids.get(house_uuid))
+            with self._lock:
+                self._watermark = self._max_updated_at(houses.values(), self._watermark)
+            self._mark_synced()
+
+RESULT_CACHE_HITS = RESULT_CACHE_REQUESTS.labels('hit')
+RESULT_CACHE_MISSES = RESULT_CACHE_REQUESTS.labels('miss')
+
+class RecommendationCache:
+    """
+    Cache limitado das recomendações já calculadas, com expiração por tempo (TTL) e descarte LRU.
+
+    As chaves incluem a versão do catálogo de moradias, então qualquer alteração no catálogo torna
+    as entradas antigas inalcançáveis (elas expiram ou são descartadas pelo LRU). Alterações no perfil
+    do universitário invalidam suas entradas via invalidate(), chamado pelo change stream do catálogo;
+    sem change stream, o TTL limita por quanto tempo uma recomendação desatualizada pode ser servida.
+
+    Cada invalidate() também incrementa a geração do universitário. Quem calcula uma recomendação lê
+    generation() antes de buscar o perfil e a informa a put(), que descarta o resultado se o perfil
+    foi invalidado durante o cálculo.
+
+    Variáveis de ambiente:
+        RESULT_CACHE_MAXSIZE: Número máximo de entradas. 0 desativa o cache. Padrão: 4096.
+        RESULT_CACHE_TTL: Tempo de vida das entradas, em segundos. Padrão: 300.
+    """
+
+    def __init__(self):
+        self.maxsize = int(getenv('RESULT_CACHE_MAXSIZE', 4096))
+        self.ttl = float(getenv('RESULT_CACHE_TTL', 300))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_uuid = {}
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[list]:
+        """
+        Retorna a recomendação em cache para a chave, ou None se ela não existir ou tiver expirado.
+
+        Args:
+            key (tuple): Chave no formato (university_uuid, versão do catálogo, parâmetros da consulta...).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                RESULT_CACHE_MISSES.inc()
+                return None
+            expires_at, houses = entry
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                RESULT_CACHE_MISSES.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            RESULT_CACHE_HITS.inc()
+            return houses
+
+    def generation(self, university_uuid: str) -> int:
+        """Retorna a geração atual do universitário, incrementada a cada invalidate()."""
+        return self._generations.get(university_uuid, 0)
+
+    def put(self, key: tuple, houses: list, generation: Optional[int] = None) -> None:
+        """
+        Armazena uma recomendação, descartando as entradas usadas há mais tempo se o cache estiver cheio.
+
+        Args:
+            key (tuple): Chave retornada por recommendation_cache_key().
+            houses (list): A recomendação calculada.
+            generation (int, opcional): A geração do universitário lida antes da busca do perfil. Se o
+                universitário foi invalidado desde então, a recomendação não é armazenada.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and self._generations.get(key[0], 0) != generation:
+                return
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (time.monotonic() + self.ttl, houses)
+            self._keys_by_uuid.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, university_uuid: str) -> None:
+        """Remove todas as entradas de um universitário e incrementa sua geração."""
+        with self._lock:
+            self._generations[university_uuid] = self._generations.get(university_uuid, 0) + 1
+            for key in self._keys_by_uuid.pop(university_uuid, ()):
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def reinit_after_fork(self) -> None:
+        """Recria, no processo filho criado por fork, o lock herdado do processo pai."""
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_uuid.clear()
+
+    def stats(self) -> dict:
+        """Retorna as métricas do cache."""
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+    def _discard(self, key: tuple) -> None:
+        del self._entries[key]
+        keys = self._keys_by_uuid.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_uuid[key[0]]
+
+def select_top_houses(probabilities: np.ndarray, limit: Optional[int] = None, offset: int = 0,
+                      min_probability: float = 0.0, exclude_zero: bool = False) -> np.ndarray:
+    """
+    Seleciona os índices das moradias com maiores probabilidades, em ordem decrescente, sem ordenar o catálogo inteiro.
+
+    A seleção é parcial (np.partition) e só os offset + limit primeiros índices são ordenados. Empates são
+    desfeitos pela posição da moradia no catálogo, para que páginas consecutivas nunca repitam moradias.
+
+    Args:
+        probabilities (np.ndarray): Probabilidades de todas as moradias, como retornadas por batch_match_percentages().
+        limit (int, opcional): Número máximo de moradias retornadas. None retorna todas.
+        offset (int, opcional): Número de moradias a ignorar no início da ordenação.
+        min_probability (float, opcional): Probabilidade mínima para que uma moradia seja considerada.
+        exclude_zero (bool, opcional): Se True, moradias com probabilidade 0 nunca são consideradas.
+
+    Returns:
+        np.ndarray: Os índices das moradias selecionadas, da maior para a menor probabilidade.
+    """
+    eligible = probabilities >= min_probability
+    if exclude_zero:
+        eligible &= probabilities > 0
+    candidates = np.flatnonzero(eligible)
+    scores = probabilities[candidates]
+    wanted = len(candidates) if limit is None else min(offset + limit, len(candidates))
+    if wanted <= 0:
+        return candidates[:0]
+
+    if wanted < len(candidates):
+        # Menor probabilidade que ainda entra na seleção: tudo acima dela entra, e os empates
+        # com ela são preenchidos na ordem do catálogo
+        threshold = np.partition(scores, len(scores) - wanted)[len(scores) - wanted]
+        above = scores > threshold
+        ties = np.flatnonzero(scores == threshold)[:wanted - int(above.sum())]
+        selected = np.concatenate([np.flatnonzero(above), ties])
+        candidates, scores = candidates[selected], scores[selected]
+
+    order = np.lexsort((candidates, -scores))
+    return candidates[order][offset:offset + wanted]
+
+def recommendation_cache_key(snapshot: Optional[CatalogueSnapshot], university_uuid: str, limit: Optional[int],
+                             offset: int, min_probability: float, exclude_zero: bool = False) -> Optional[tuple]:
+    """Retorna a chave do cache de recomendações, ou None quando o catálogo não está carregado."""
+    if snapshot is None:
+        return None
+    return (university_uuid, snapshot.version, limit, offset, min_probability, exclude_zero)
+
+def rank_houses(university_profile: MatchProfile, snapshot: Optional[CatalogueSnapshot], limit: Optional[int] = None,
+                offset: int = 0, min_probability: float = 0.0, exclude_zero: bool = False,
+                summary: Optional[dict] = None) -> list:
+    """
+    Calcula as probabilidades de um universitário com todas as moradias e retorna a página pedida, em ordem decrescente.
+
+    Com exclude_zero, as moradias com 0% são omitidas: um universitário com 'Alergia' recebe uma lista vazia
+    sem nenhum cálculo e, sem o catálogo, as moradias com 'Alergia' nem são buscadas no MongoDB.
+
+    Args:
+        university_profile (MatchProfile): Perfil do universitário.
+        snapshot (CatalogueSnapshot | None): Visão do catálogo. Se None, as moradias são consultadas no MongoDB.
+        limit (int, opcional): Número máximo de moradias retornadas. None retorna todas.
+        offset (int, opcional): Número de moradias a ignorar no início da ordenação.
+        min_probability (float, opcional): Probabilidade mínima das moradias retornadas.
+        exclude_zero (bool, opcional): Se True, omite as moradias com probabilidade 0.
+        summary (dict, opcional): Se informado, recebe a origem das moradias ('source') e o número
+            de moradias avaliadas ('candidates'), para o resumo da requisição.
+
+    Returns:
+        list: Uma lista de objetos contendo UUIDs das moradias e suas respectivas probabilidades.
+    """
+    houses_to_return = []
+    summary = summary if summary is not None else {}
+    if exclude_zero and university_profile.allergy:
+        logger.debug("Universitário com 'Alergia': todas as moradias têm 0% e foram omitidas.")
+        summary.update(source='alergia', candidates=0)
+        return houses_to_return
+
+    if snapshot is not None:
+        summary['source'] = 'catálogo'
+        house_uuids = snapshot.uuids
+        with timed_stage('scoring'):
+            probabilities = snapshot.match_percentages(university_profile)
+    else:
+        logger.warning("Catálogo de moradias indisponível. Consultando as moradias no MongoDB.")
+        with timed_stage('houses'):
+            houses = get_all_house_filters(ALLERGY_FREE_QUERY if exclude_zero else None)
+        house_uuids = np.frombuffer(b''.join(houses), dtype=UUID_DTYPE)
+        with timed_stage('scoring'):
+            house_matrix = encode_profiles([compile_profile(housing_filters) for housing_filters in houses.values()])
+            probabilities = batch_match_percentages(house_matrix, university_profile)
+        summary['source'] = 'MongoDB'
+    summary['candidates'] = len(probabilities)
+    CANDIDATES_SCORED.inc(len(probabilities))
+
+    with timed_stage('selection'):
+        # Ordena de forma decrescente apenas as moradias da página pedida
+        selected = select_top_houses(probabilities, limit, offset, min_probability, exclude_zero)
+
+        # Os UUIDs ficam em bytes durante todo o cálculo e só os da página são formatados, em lote
+        for house_uuid, probability in zip(format_uuids(house_uuids[selected]), probabilities[selected].tolist()):
+            houses_to_return.append({"uid": house_uuid, "probability": probability})
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for house in houses_to_return:
+            logger.debug("Moradia %s adicionada com probabilidade %s%%", house['uid'], house['probability'])
+    return houses_to_return
+
+def log_recommendation_summary(university_uuid: str, houses: list, started: float, summary: dict) -> None:
+    """
+    Registra, em uma única linha INFO, o resumo de uma requisição de recomendações.
+
+    Args:
+        university_uuid (str): O UUID do universitário.
+        houses (list): As moradias retornadas.
+        started (float): O instante de início da requisição, em time.perf_counter().
+        summary (dict): Origem das moradias ('source'), moradias avaliadas ('candidates') e tempos, em
+            milissegundos, da busca dos filtros ('filters_ms') e do cálculo ('ranking_ms').
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    stages = ', '.join(
+        f"{label}: {summary[key]:.1f} ms" for key, label in (('filters_ms', 'filtros'), ('ranking_ms', 'cálculo'))
+        if key in summary
+    )
+    logger.info(
+        "Recomendações para %s: %d retornadas de %s moradias avaliadas (origem: %s) em %.1f ms%s.",
+        university_uuid, len(houses), summary.get('candidates', '-'), summary.get('source', '-'),
+        (time.perf_counter() - started) * 1000, f" ({stages})" if stages else ''
+    )
+
+# Motor de cálculo das recomendações: 'python' (catálogo residente e cálculo vetorizado) ou
+# 'aggregation' (percentuais calculados no MongoDB por um pipeline de agregação)
+SCORING_ENGINES = ('python', 'aggregation')
+SCORING_ENGINE = getenv('SCORING_ENGINE', 'python').lower()
+if SCORING_ENGINE not in SCORING_ENGINES:
+    raise RuntimeError(
+        f"SCORING_ENGINE inválido: {SCORING_ENGINE!r}. Valores aceitos: {', '.join(SCORING_ENGINES)}."
+    )
+# Único critério de escolha do motor, usado por todos os pontos que dependem dele
+AGGREGATION_ENGINE = SCORING_ENGINE == 'aggregation'
+
+def _agg_strip_brackets(field: str) -> dict:
+    """Expressão de agregação equivalente a extract_filters(): remove '[' e ']' de strings e trata campos ausentes como null."""
+    return {'$cond': [
+        {'$eq': [{'$type': f'${field}'}, 'string']},
+        {'$replaceAll': {
+            'input': {'$replaceAll': {'input': f'${field}', 'find': '[', 'replacement': ''}},
+            'find': ']', 'replacement': ''
+        }},
+        {'$ifNull': [f'${field}', None]}
+    ]}
+
+def _agg_has_animal_value(target: str) -> dict:
+    """Expressão de agregação equivalente a _has_animal_value() sobre o campo 'animais_estimacao' da moradia."""
+    return {'$switch': {
+        'branches': [
+            {
+                'case': {'$eq': [{'$type': '$animais_estimacao'}, 'string']},
+                'then': {'$gte': [{'$indexOfCP': [_agg_strip_brackets('animais_estimacao'), target]}, 0]}
+            },
+            {
+                'case': {'$isArray': '$animais_estimacao'},
+                'then': {'$anyElementTrue': [{'$map': {
+                    'input': '$animais_estimacao',
+                    'as': 'animal',
+                    'in': {'$gte': [{'$indexOfCP': [
+                        {'$convert': {'input': '$$animal', 'to': 'string', 'onError': '', 'onNull': 'None'}},
+                        target
+                    ]}, 0]}
+                }}]}
+            }
+        ],
+        'default': False
+    }}
+
+def _thaw(value: Any) -> Any:
+    """Desfaz _freeze() para que o valor original de um campo categórico possa ser enviado ao MongoDB."""
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+def _category_literal(field: str, code: int) -> dict:
+    """Expressão de agregação com o valor original do código de um campo categórico."""
+    return {'$literal': _thaw(CATEGORY_CODES[field].value(code))}
+
+def scoring_pipeline(university_profile: MatchProfile, limit: Optional[int] = None, offset: int = 0,
+                     min_probability: float = 0.0, exclude_zero: bool = False) -> list:
+    """
+    Monta o pipeline de agregação que calcula no MongoDB o mesmo percentual de score_profiles().
+
+    O pipeline normaliza os campos de cada moradia como extract_filters() e compile_profile(), calcula o
+    percentual com as mesmas regras e devolve apenas 'idUsuarioMoradia' e 'probability' da página pedida.
+    Os valores do universitário entram no pipeline como constantes ($literal).
+
+    Diferenças conhecidas em relação ao cálculo em Python:
+    - Empates são ordenados por '_id', e não pela ordem do catálogo.
+    - 'numero_maximo_pessoas' é convertido com $convert, que, ao contrário de int(), não aceita sinal
+      explícito ('+3') nem separadores ('1_000').
+
+    Args:
+        university_profile (MatchProfile): Perfil do universitário.
+        limit (int, opcional): Número máximo de moradias retornadas. None retorna todas.
+        offset (int, opcional): Número de moradias a ignorar no início da ordenação.
+        min_probability (float, opcional): Probabilidade mínima das moradias retornadas.
+        exclude_zero (bool, opcional): Se True, as moradias com 'Alergia' são descartadas já no primeiro
+            $match e as demais moradias com 0% não são retornadas.
+
+    Returns:
+        list: Os estágios do pipeline de agregação.
+    """
+    profile = university_profile
+    pet_lover = {'$or': ['$pet_lover', {'$literal': profile.pet_lover}]}
+    gender_any = {'$or': [{'$eq': ['$gender', GENDER_ANY]}, {'$literal': profile.gender == GENDER_ANY_CODE}]}
+    if profile.max_people is None:
+        max_people_match = 0
+    else:
+        max_people_match = {'$cond': [
+            {'$and': [{'$ne': ['$max_people', None]}, {'$lte': ['$max_people', {'$literal': profile.max_people}]}]}, 1, 0
+        ]}
+
+    house_query = {'tipo': 'moradia', 'idUsuarioMoradia': {'$exists': True}}
+    probability_query = {'$gte': min_probability}
+    if exclude_zero:
+        house_query.update(ALLERGY_FREE_QUERY)
+        probability_query['$gt'] = 0
+
+    pipeline = [
+        {'$match': house_query},
+        {'$project': {
+            'idUsuarioMoradia': 1,
+            'allergy': _agg_has_animal_value(ANIMAL_ALLERGY),
+            'pet_lover': {'$or': [_agg_has_animal_value(value) for value in ANIMAL_LOVER_VALUES]},
+            'gender': _agg_strip_brackets('preferencia_genero'),
+            'max_people': {'$convert': {
+                'input': {'$cond': [
+                    {'$eq': [{'$type': '$numero_maximo_pessoas'}, 'string']},
+                    {'$trim': {'input': _agg_strip_brackets('numero_maximo_pessoas')}},
+                    '$numero_maximo_pessoas'
+                ]},
+                'to': 'long', 'onError': None, 'onNull': None
+            }},
+            'smoking': _agg_strip_brackets('frequencia_fumo'),
+            'drinking': _agg_strip_brackets('frequencia_bebida')
+        }},
+        {'$addFields': {'probability': {'$cond': [
+            {'$or': ['$allergy', {'$literal': profile.allergy}]},
+            0.0,
+            {'$let': {
+                'vars': {
+                    'total': {'$add': [4, {'$cond': [pet_lover, 1, 0]}, {'$cond': [gender_any, 1, 0]}]},
+                    'matched': {'$add': [
+                        {'$cond': [pet_lover, 1, 0]},
+                        {'$cond': [gender_any, 2, {'$cond': [{'$eq': ['$gender', _category_literal('preferencia_genero', profile.gender)]}, 1, 0]}]},
+                        max_people_match,
+                        {'$cond': [{'$eq': ['$smoking', _category_literal('frequencia_fumo', profile.smoking)]}, 1, 0]},
+                        {'$cond': [{'$eq': ['$drinking', _category_literal('frequencia_bebida', profile.drinking)]}, 1, 0]}
+                    ]}
+                },
+                'in': {'$multiply': [{'$divide': ['$$matched', '$$total']}, 100]}
+            }}
+        ]}}},
+        {'$match': {'probability': probability_query}},
+        {'$sort': {'probability': -1, '_id': 1}}
+    ]
+    if offset:
+        pipeline.append({'$skip': offset})
+    if limit is not None:
+        pipeline.append({'$limit': limit})
+    pipeline.append({'$project': {'_id': 0, 'idUsuarioMoradia': 1, 'probability': 1}})
+    return pipeline
+
+def houses_from_aggregation(documents) -> list:
+    """
+    Converte os documentos retornados por scoring_pipeline() no formato de resposta de rank_houses().
+
+    Args:
+        documents (Iterable[dict]): Documentos com 'idUsuarioMoradia' e 'probability'.
+
+    Returns:
+        list: Uma lista de objetos contendo UUIDs das moradias e suas respectivas probabilidades.
+    """
+    house_uuids = []
+    probabilities = []
+    for document in documents:
+        binary_uuid = document['idUsuarioMoradia']
+        if not isinstance(binary_uuid, bytes) or len(binary_uuid) != 16:
+            logger.error(f"Erro ao converter UUID: {binary_uuid!r} não tem 16 bytes.")
+            continue
+        house_uuids.append(binary_uuid)
+        probabilities.append(document['probability'])
+
+    houses_to_return = []
+    uuids = np.frombuffer(b''.join(house_uuids), dtype=UUID_DTYPE)
+    for house_uuid, probability in zip(format_uuids(uuids), probabilities):
+        houses_to_return.append({"uid": house_uuid, "probability": probability})
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for house in houses_to_return:
+            logger.debug("Moradia %s adicionada com probabilidade %s%%", house['uid'], house['probability'])
+    return houses_to_return
+
+def rank_houses_aggregation(university_profile: MatchProfile, limit: Optional[int] = None, offset: int = 0,
+                            min_probability: float = 0.0, exclude_zero: bool = False) -> list:
+    """
+    Equivalente a rank_houses(), mas com o cálculo e a ordenação feitos no MongoDB por scoring_pipeline().
+
+    Apenas a página pedida trafega do MongoDB para a aplicação, em vez dos perfis de todas as moradias.
+    """
+    pipeline = ranking_pipeline(university_profile, limit, offset, min_probability, exclude_zero)
+    if pipeline is None:
+        return []
+    with timed_stage('aggregation'):
+        return houses_from_aggregation(get_collection().aggregate(pipeline))
+
+def ranking_pipeline(university_profile: MatchProfile, limit: Optional[int] = None, offset: int = 0,
+                     min_probability: float = 0.0, exclude_zero: bool = False) -> Optional[list]:
+    """
+    Retorna o pipeline de scoring_pipeline(), ou None quando nenhuma moradia pode ser retornada e a
+    agregação não precisa ser executada (universitário com 'Alergia' e exclude_zero).
+    """
+    if exclude_zero and university_profile.allergy:
+        logger.debug("Universitário com 'Alergia': todas as moradias têm 0% e foram omitidas.")
+        return None
+    return scoring_pipeline(university_profile, limit, offset, min_probability, exclude_zero)
+
+def check_scoring_parity(students: int = 50) -> dict:
+    """
+    Compara os percentuais calculados por scoring_pipeline() com os de score_profiles() para todas as moradias.
+
+    São comparados os perfis de até 'students' universitários da coleção, além de um perfil vazio
+    (universitário não encontrado) e de um perfil com 'Alergia'.
+
+    Args:
+        students (int, opcional): Número máximo de universitários comparados.
+
+    Returns:
+        dict: Número de perfis e de moradias comparados, número de divergências e até 10 exemplos de divergências.
+    """
+    collection = get_collection()
+    house_profiles = {
+        house_uuid: compile_profile(housing_filters) for house_uuid, housing_filters in fetch_house_filters().items()
+    }
+    profiles = [compile_profile({}), compile_profile({'animais_estimacao': ANIMAL_ALLERGY})]
+    for document in collection.find({'tipo': {'$ne': 'moradia'}}, {field: 1 for field in FILTER_FIELDS}).limit(students):
+        profiles.append(compile_profile(extract_filters(document)))
+
+    mismatches = []
+    for profile in profiles:
+        aggregated = {bytes(document['idUsuarioMoradia']): document['probability']
+                      for document in collection.aggregate(scoring_pipeline(profile))}
+        for house_uuid in house_profiles.keys() | aggregated.keys():
+            expected = score_profiles(house_profiles[house_uuid], profile) if house_uuid in house_profiles else None
+            actual = aggregated.get(house_uuid)
+            if expected is None or actual is None or abs(expected - actual) > 1e-9:
+                mismatches.append({'profile': profile._asdict(), 'uid': format_uuid(house_uuid),
+                                   'python': expected, 'aggregation': actual})
+
+    return {
+        'profiles': len(profiles),
+        'houses': len(house_profiles),
+        'mismatches': len(mismatches),
+        'examples': mismatches[:10]
+    }
+
+class RecommendationRequest(NamedTuple):
+    """
+    Estado de uma recomendação entre a consulta ao cache e o cálculo.
+
+    Criado por start_recommendation() e consumido por rank_recommendation() e finish_recommendation(),
+    que formam o núcleo de get_all_probas() e de app_async.get_all_probas_async(); as duas variantes
+    diferem apenas na forma de buscar o perfil do universitário (e, no app_async, de executar a agregação).
+    """
+    university_uuid: str
+    limit: Optional[int]
+    offset: int
+    min_probability: float
+    exclude_zero: bool
+    snapshot: Optional[CatalogueSnapshot]
+    cache_key: Optional[tuple]
+    generation: int
+    started: float
+    summary: dict
+
+def start_recommendation(university_uuid: str, limit: Optional[int] = None, offset: int = 0,
+                         min_probability: float = 0.0, exclude_zero: bool = False) -> tuple:
+    """
+    Primeira etapa de uma recomendação: lê o catálogo e procura a recomendação no cache.
+
+    Deve ser chamada antes da busca do perfil do universitário, pois lê a sua geração no cache.
+
+    Returns:
+        tuple: (RecommendationRequest, cópia da recomendação em cache ou None se ela precisar ser calculada).
+    """
+    started = time.perf_counter()
+    summary = {}
+    snapshot = None
+    cache_key = None
+    if AGGREGATION_ENGINE:
+        # O motor de agregação lê as moradias do MongoDB a cada requisição, então o cache não é usado
+        summary['source'] = 'agregação'
+    else:
+        snapshot = catalogue.snapshot()
+        cache_key = recommendation_cache_key(snapshot, university_uuid, limit, offset, min_probability, exclude_zero)
+    if cache_key is not None:
+        with timed_stage('cache'):
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            summary['source'] = 'cache'
+            log_recommendation_summary(university_uuid, cached, started, summary)
+            return None, list(cached)
+
+    # Lida antes da busca do perfil: se ele mudar durante o cálculo, o resultado não é armazenado
+    generation = result_cache.generation(university_uuid)
+    recommendation = RecommendationRequest(
+        university_uuid, limit, offset, min_probability, exclude_zero, snapshot, cache_key, generation, started, summary
+    )
+    return recommendation, None
+
+def rank_recommendation(recommendation: RecommendationRequest, university_profile: MatchProfile) -> list:
+    """Calcula a recomendação com o SCORING_ENGINE configurado, a partir do perfil já compilado do universitário."""
+    if AGGREGATION_ENGINE:
+        return rank_houses_aggregation(
+            university_profile, recommendation.limit, recommendation.offset,
+            recommendation.min_probability, recommendation.exclude_zero
+        )
+    return rank_houses(
+        university_profile, recommendation.snapshot, recommendation.limit, recommendation.offset,
+        recommendation.min_probability, recommendation.exclude_zero, recommendation.summary
+    )
+
+def finish_recommendation(recommendation: RecommendationRequest, houses: list, filters_done: float) -> list:
+    """
+    Última etapa de uma recomendação: armazena o resultado no cache e registra o resumo da requisição.
+
+    Args:
+        recommendation (RecommendationRequest): O estado criado por start_recommendation().
+        houses (list): A recomendação calculada.
+        filters_done (float): O instante, em time.perf_counter(), em que o perfil do universitário foi obtido.
+
+    Returns:
+        list: Uma cópia da recomendação.
+    """
+    summary = recommendation.summary
+    summary['filters_ms'] = (filters_done - recommendation.started) * 1000
+    summary['ranking_ms'] = (time.perf_counter() - filters_done) * 1000
+    if recommendation.cache_key is not None:
+        result_cache.put(recommendation.cache_key, houses, recommendation.generation)
+    log_recommendation_summary(recommendation.university_uuid, houses, recommendation.started, summary)
+    return list(houses)
+
+def get_all_probas(university_uuid: str, limit: Optional[int] = None, offset: int = 0,
+                   min_probability: float = 0.0, exclude_zero: bool = False) -> list:
+    """
+    Retorna uma lista de UUIDs das moradias ordenadas de forma decrescente com base nas probabilidades de correspondência.
+
+    A função realiza os seguintes passos:
+    1. Reaproveita do cache as recomendações já calculadas para a mesma versão do catálogo.
+    2. Obtém os filtros do universitário uma única vez.
+    3. Obtém os perfis de todas as moradias do catálogo residente (ou do MongoDB, se o catálogo não estiver carregado).
+    4. Calcula a probabilidade de correspondência entre as preferências da moradia e as do universitário.
+    5. Seleciona a página pedida das moradias com maiores probabilidades.
+    6. Cria um objeto com o UUID e a probabilidade de cada moradia selecionada.
+
+    Com SCORING_ENGINE=aggregation, o cache não é usado e os passos 3 a 6 são executados no MongoDB
+    por rank_houses_aggregation().
+
+    Args:
+        university_uuid (str): O UUID do universitário no formato padrão (ex: '592f7f4a-ebd2-4b3a-7e46-7e1af20de594').
+        limit (int, opcional): Número máximo de moradias retornadas. None retorna todas.
+        offset (int, opcional): Número de moradias a ignorar no início da ordenação.
+        min_probability (float, opcional): Probabilidade mínima das moradias retornadas.
+        exclude_zero (bool, opcional): Se True, omite as moradias com probabilidade 0.
+
+    Returns:
+        list: Uma lista de objetos contendo UUIDs das moradias e suas respectivas probabilidades.
+
+    Raises:
+        PyMongoError: Erros do MongoDB são propagados e nada é armazenado no cache: um universitário cujo
+            perfil não pôde ser buscado não é avaliado como se não tivesse filtros.
+    """
+    logger.debug("Iniciando cálculo de probabilidades para o UUID universitário: %s", university_uuid)
+    recommendation, cached = start_recommendation(university_uuid, limit, offset, min_probability, exclude_zero)
+    if cached is not None:
+        return cached
+
+    # O perfil do universitário é carregado uma única vez e reutilizado para todas as moradias
+    university_profile = compile_profile(get_filters(university_uuid))
+    filters_done = time.perf_counter()
+    houses_to_return = rank_recommendation(recommendation, university_profile)
+    return finish_recommendation(recommendation, houses_to_return, filters_done)
+
+# Número máximo de elementos (grupos de universitários × grupos de moradias) de cada bloco da matriz de percentuais
+BATCH_SCORE_CHUNK_ELEMENTS = 4_000_000
+
+def rank_houses_batch(student_profiles: dict, snapshot: Optional[CatalogueSnapshot], limit: Optional[int] = None,
+                      offset: int = 0, min_probability: float = 0.0, exclude_zero: bool = False,
+                      summary: Optional[dict] = None) -> dict:
+    """
+    Calcula as recomendações de vários universitários sobre o mesmo catálogo, com as regras de rank_houses().
+
+    Universitários com perfis iguais formam um grupo e recebem a mesma recomendação. A matriz de
+    percentuais entre os grupos de universitários e os grupos de moradias é calculada por
+    score_group_matrix() em blocos de até BATCH_SCORE_CHUNK_ELEMENTS elementos.
+
+    Args:
+        student_profiles (dict): UUID do universitário → MatchProfile.
+        snapshot (CatalogueSnapshot | None): Visão do catálogo. Se None, as moradias são consultadas no MongoDB uma única vez.
+        limit, offset, min_probability, exclude_zero: Os mesmos de rank_houses().
+        summary (dict, opcional): Se informado, recebe a origem das moradias ('source'), o número de moradias
+            avaliadas ('candidates') e o número de perfis distintos de universitários ('distinct_profiles').
+
+    Returns:
+        dict: UUID do universitário → lista de objetos com o UUID da moradia e a probabilidade.
+
+    Raises:
+        PyMongoError: Se o catálogo não estiver disponível e a consulta das moradias no MongoDB falhar.
+    """
+    summary = summary if summary is not None else {}
+    if snapshot is not None:
+        summary['source'] = 'catálogo'
+        house_uuids = snapshot.uuids
+        houses = snapshot.matrix
+    else:
+        logger.warning("Catálogo de moradias indisponível. Consultando as moradias no MongoDB.")
+        with timed_stage('houses'):
+            house_filters = fetch_house_filters(ALLERGY_FREE_QUERY if exclude_zero else None)
+        house_uuids = np.frombuffer(b''.join(house_filters), dtype=UUID_DTYPE)
+        houses = encode_profiles([compile_profile(filters) for filters in house_filters.values()])
+        summary['source'] = 'MongoDB'
+    summary['candidates'] = len(house_uuids)
+
+    uuids = list(student_profiles)
+    students = encode_profiles(list(student_profiles.values()))
+    summary['distinct_profiles'] = len(students.allergy)
+    CANDIDATES_SCORED.inc(len(uuids) * len(house_uuids))
+
+    recommendations = []
+    chunk = max(1, BATCH_SCORE_CHUNK_ELEMENTS // max(1, len(houses.allergy)))
+    for start in range(0, len(students.allergy), chunk):
+        students_chunk = HouseMatrix._make(field[start:start + chunk] for field in students)
+        with timed_stage('scoring'):
+            group_scores = score_group_matrix(houses, students_chunk)
+        with timed_stage('selection'):
+            for row, student_allergy in zip(group_scores, students_chunk.allergy):
+                if exclude_zero and student_allergy:
+                    recommendations.append([])
+                    continue
+                probabilities = row[houses.group_index]
+                selected = select_top_houses(probabilities, limit, offset, min_probability, exclude_zero)
+                recommendations.append([
+                    {"uid": house_uuid, "probability": probability}
+                    for house_uuid, probability in zip(format_uuids(house_uuids[selected]), probabilities[selected].tolist())
+                ])
+
+    # Cada universitário recebe a recomendação do seu grupo; as listas são compartilhadas entre universitários iguais
+    return {university_uuid: recommendations[group] for university_uuid, group in zip(uuids, students.group_index.tolist())}
+
+def get_all_probas_batch(university_uuids: list, limit: Optional[int] = None, offset: int = 0,
+                         min_probability: float = 0.0, exclude_zero: bool = False,
+                         summary: Optional[dict] = None) -> dict:
+    """
+    Versão em lote de get_all_probas(): retorna as recomendações de vários universitários em uma única chamada.
+
+    Os perfis dos universitários são buscados com uma única consulta $in, o catálogo é lido uma única vez
+    e os percentuais são calculados por rank_houses_batch(). Como em get_all_probas(), um universitário
+    não encontrado é avaliado com filtros vazios; ele é listado em summary['not_found']. O cache de
+    recomendações não é usado, e o catálogo residente é usado com qualquer SCORING_ENGINE (startup() o
+    inicia mesmo com SCORING_ENGINE=aggregation). Com CATALOGUE_SYNC_MODE=off, ou antes da carga inicial,
+    cada chamada consulta todas as moradias no MongoDB, o que é registrado em um aviso por rank_houses_batch().
+
+    Args:
+        university_uuids (list): UUIDs dos universitários no formato padrão.
+        limit, offset, min_probability, exclude_zero: Os mesmos de get_all_probas(), aplicados a cada universitário.
+        summary (dict, opcional): Se informado, recebe os UUIDs não encontrados ('not_found') e as métricas
+            de rank_houses_batch().
+
+    Returns:
+        dict: UUID do universitário → lista de objetos contendo UUIDs das moradias e suas respectivas
+        probabilidades, na ordem de university_uuids.
+
+    Raises:
+        PyMongoError: Erros do MongoDB são propagados. Como em get_all_probas(), uma falha na busca
+            dos universitários não é tratada como "não encontrados".
+    """
+    started = time.perf_counter()
+    summary = summary if summary is not None else {}
+    snapshot = catalogue.snapshot()
+    filters = get_filters_batch(university_uuids)
+    summary['not_found'] = [university_uuid for university_uuid in university_uuids if university_uuid not in filters]
+    student_profiles = {
+        university_uuid: compile_profile(filters.get(university_uuid, {})) for university_uuid in university_uuids
+    }
+    recommendations = rank_houses_batch(
+        student_profiles, snapshot, limit, offset, min_probability, exclude_zero, summary
+    )
+    logger.info(
+        "Recomendações em lote: %d universitários (%d perfis distintos, %d não encontrados) e %d moradias "
+        "avaliadas (origem: %s) em %.1f ms.",
+        len(university_uuids), summary['distinct_profiles'], len(summary['not_found']), summary['candidates'],
+        summary['source'], (time.perf_counter() - started) * 1000
+    )
+    return recommendations
 
-def get_filters(uuid_str: str) -> dict:
+def parse_recommendation_request(data: Any) -> tuple:
     """
-    Busca um usuário na coleção com base no UUID fornecido e retorna um dicionário de filtros extraídos de campos específicos.
+    Valida o corpo JSON de uma requisição de recomendações.
 
     Args:
-        uuid_str (str): O UUID do usuário no formato padrão (ex: '592f7f4a-ebd2-4b3a-7e46-7e1af20de594').
+        data (Any): O corpo JSON já decodificado.
 
     Returns:
-        dict: Um dicionário onde cada chave é um dos campos especificados e cada valor é uma lista de filtros.
+        tuple: (parâmetros, None) com os argumentos de get_all_probas em caso de sucesso,
+        ou (None, mensagem de erro) se o corpo for inválido.
     """
-    global collection
-    logger.info(f"Obtendo filtros para o UUID: {uuid_str}")
-
-    # Tentar converter a string UUID para um objeto UUID
-    try:
-        uuid_obj = uuid.UUID(uuid_str)
-        logger.debug(f"UUID convertido com sucesso: {uuid_obj}")
-    except ValueError:
-        logger.error("UUID inválido fornecido.")
-        return {}
-    
-    # Converter o objeto UUID para Binary com subtype=4
-    binary_uuid = Binary(uuid_obj.bytes, subtype=4)
-    
-    # Realizar a busca no MongoDB
+    if not isinstance(data, dict):
+        return None, 'O corpo da requisição deve ser um objeto JSON.'
+    university_uuid = data.get('university_uuid')
+    if not university_uuid:
+        return None, 'O campo "university_uuid" é obrigatório.'
     try:
-        user = collection.find_one({'idUsuarioMoradia': binary_uuid})
-        if not user:
-            logger.warning("Nenhum usuário encontrado com o UUID fornecido.")
-            return {}
-        logger.info("Usuário encontrado com sucesso.")
-    except Exception as e:
-        logger.error(f"Erro ao buscar usuário no MongoDB: {e}")
-        return {}
-    
-    # Lista de campos a serem processados (removido 'preferencias_moveis_outro')
-    fields_to_process = [
-        'animais_estimacao',
-        'preferencia_genero',
-        'numero_maximo_pessoas',
-        'frequencia_fumo',
-        'frequencia_bebida'
-    ]
-    
-    filters = {}
-    for field in fields_to_process:
-        value = user.get(field)
-        if isinstance(value, str):
-            value = value.replace('[', '').replace(']', '')
-        filters[field] = value
-        logger.debug(f"Filtro extraído - {field}: {value}")
-    
-    logger.info("Filtros obtidos com sucesso.")
-    return filters
+        uuid.UUID(university_uuid)
+    except (ValueError, TypeError, AttributeError):
+        return None, 'O "university_uuid" fornecido não é um UUID válido.'
+    params, error = _parse_page_params(data)
+    if error:
+        return None, error
+    # Formato canônico, para que o cache e a sua invalidação usem sempre a mesma chave
+    return {'university_uuid': str(uuid.UUID(university_uuid)), **params}, None
 
-def calculate_match_percentage(housing_filters: dict, university_filters: dict) -> float:
+def parse_batch_recommendation_request(data: Any) -> tuple:
     """
-    Calcula o percentual de correspondência entre dois conjuntos de filtros, aplicando regras especiais.
+    Valida o corpo JSON de uma requisição de recomendações em lote.
 
     Args:
-        housing_filters (dict): Dicionário de filtros do usuário de moradia.
-        university_filters (dict): Dicionário de filtros do usuário universitário.
+        data (Any): O corpo JSON já decodificado.
 
     Returns:
-        float: Percentual de correspondência entre os dois conjuntos de filtros.
+        tuple: (parâmetros, None) com os argumentos de get_all_probas_batch em caso de sucesso,
+        ou (None, mensagem de erro) se o corpo for inválido. UUIDs repetidos são considerados uma única vez.
     """
-    logger.info("Calculando o percentual de correspondência.")
-    try:
-        # Inicializa variáveis
-        total_filters = 0
-        matched_filters = 0
-
-        # Verifica se algum dos conjuntos de filtros contém 'Alergia' ou ['Gosto muito', 'Não tenho, mas amo'] em 'animais_estimacao'
-        animals_intersection = housing_filters.get('animais_estimacao', []) + university_filters.get('animais_estimacao', [])
-
-        if 'Alergia' in animals_intersection:
-            logger.info("Alergia detectada nas preferências de animais. Retornando 0%.")
-            return 0.0
-        elif 'Gosto muito' in animals_intersection or 'Não tenho, mas amo' in animals_intersection:
-            total_filters += 1
-            matched_filters += 1
-            housing_filters.pop('animais_estimacao', None)
-            university_filters.pop('animais_estimacao', None)
-            logger.debug("Condição especial para 'Gosto muito' ou 'Não tenho, mas amo' aplicada.")
-
-        # Verifica se algum dos conjuntos de filtros contém 'Tanto faz' em 'preferencia_genero'
-        gender_intersection = [
-            housing_filters.get('preferencia_genero', ''),
-            university_filters.get('preferencia_genero', '')
-        ]
-
-        if 'Tanto faz' in gender_intersection:
-            total_filters += 1
-            matched_filters += 1
-            housing_filters.pop('preferencia_genero', None)
-            university_filters.pop('preferencia_genero', None)
-            logger.debug("Condição especial para 'Tanto faz' em preferencia_genero aplicada.")
-
-        # Comparação de número máximo de pessoas
+    if not isinstance(data, dict):
+        return None, 'O corpo da requisição deve ser um objeto JSON.'
+    university_uuids = data.get('university_uuids')
+    if not isinstance(university_uuids, list) or not university_uuids:
+        return None, 'O campo "university_uuids" deve ser uma lista não vazia de UUIDs.'
+    if len(university_uuids) > MAX_RECOMMENDATION_BATCH_SIZE:
+        return None, f'O campo "university_uuids" aceita no máximo {MAX_RECOMMENDATION_BATCH_SIZE} UUIDs.'
+    canonical_uuids = {}
+    for university_uuid in university_uuids:
         try:
-            housing_max = int(housing_filters.get('numero_maximo_pessoas', 0))
-            university_max = int(university_filters.get('numero_maximo_pessoas', 0))
-            if housing_max <= university_max:
-                matched_filters += 1
-                logger.debug(f"numero_maximo_pessoas: {housing_max} <= {university_max}. Incrementando matched_filters.")
-        except ValueError as ve:
-            logger.error(f"Erro na conversão de numero_maximo_pessoas: {ve}")
+            canonical_uuids.setdefault(str(uuid.UUID(university_uuid)), None)
+        except (ValueError, TypeError, AttributeError):
+            return None, f'O UUID {university_uuid!r} de "university_uuids" não é válido.'
+    params, error = _parse_page_params(data)
+    if error:
+        return None, error
+    return {'university_uuids': list(canonical_uuids), **params}, None
 
-        total_filters += 1
-        housing_filters.pop('numero_maximo_pessoas', None)
-        university_filters.pop('numero_maximo_pessoas', None)
-
-        # Processa os demais campos não arrays
-        other_fields = [
-            'preferencia_genero',
-            'frequencia_fumo',
-            'frequencia_bebida'
-        ]
-
-        for field in other_fields:
-            if housing_filters.get(field) == university_filters.get(field):
-                matched_filters += 1
-                logger.debug(f"Campo '{field}' corresponde. Incrementando matched_filters.")
-            total_filters += 1
-
-        # Evita divisão por zero
-        if total_filters == 0:
-            logger.warning("Total de filtros é zero. Retornando 0%.")
-            return 0.0
-
-        # Calcula o percentual
-        match_percentage = (matched_filters / total_filters) * 100
-        logger.info(f"Percentual de correspondência calculado: {match_percentage}%")
-        return match_percentage
-    except Exception as e:
-        logger.error(f"Ocorreu um erro ao calcular a correspondência: {e}")
-        return 0.0
+def _parse_page_params(data: dict) -> tuple:
+    """Valida os parâmetros de paginação e de filtragem comuns às requisições de recomendações."""
+    limit = data.get('limit', DEFAULT_RECOMMENDATION_LIMIT)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 0 < limit <= MAX_RECOMMENDATION_LIMIT:
+        return None, f'O campo "limit" deve ser um inteiro entre 1 e {MAX_RECOMMENDATION_LIMIT}.'
+    offset = data.get('offset', 0)
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        return None, 'O campo "offset" deve ser um inteiro maior ou igual a 0.'
+    min_probability = data.get('min_probability', 0)
+    if not isinstance(min_probability, (int, float)) or isinstance(min_probability, bool) or not 0 <= min_probability <= 100:
+        return None, 'O campo "min_probability" deve ser um número entre 0 e 100.'
+    exclude_zero = data.get('exclude_zero', False)
+    if not isinstance(exclude_zero, bool):
+        return None, 'O campo "exclude_zero" deve ser um booleano.'
+    return {
+        'limit': limit,
+        'offset': offset,
+        'min_probability': min_probability,
+        'exclude_zero': exclude_zero
+    }, None
 
-def get_all_houses() -> list:
-    """
-    Retorna uma lista de UUIDs dos documentos na coleção onde o campo 'tipo' é 'moradia'.
 
-    Utiliza a variável global 'collection' para realizar a consulta no banco de dados MongoDB.
+# Paginação padrão e máxima do endpoint /recommended-homes
+DEFAULT_RECOMMENDATION_LIMIT = int(getenv('RECOMMENDATION_DEFAULT_LIMIT', 20))
+MAX_RECOMMENDATION_LIMIT = int(getenv('RECOMMENDATION_MAX_LIMIT', 100))
+# Número máximo de universitários por chamada de /recommended-homes/batch
+MAX_RECOMMENDATION_BATCH_SIZE = int(getenv('RECOMMENDATION_MAX_BATCH_SIZE', 1000))
+
+# Token exigido pelos endpoints administrativos (cabeçalho 'Authorization: Bearer <token>').
+# Sem ele, esses endpoints ficam desativados.
+ADMIN_TOKEN = getenv('ADMIN_TOKEN') or None
+
+def check_admin_token() -> Optional[tuple]:
+    """
+    Verifica se a requisição atual traz o token de administração.
 
     Returns:
-        list: Uma lista contendo os UUIDs (em formato de string) dos documentos que correspondem ao tipo 'moradia'.
+        tuple | None: None se a requisição estiver autorizada; caso contrário, a resposta de erro
+        (403 se ADMIN_TOKEN não estiver configurado, 401 se o token estiver ausente ou incorreto).
     """
-    global collection
-    logger.info("Obtendo todas as moradias da coleção.")
+    if ADMIN_TOKEN is None:
+        return jsonify({'error': 'Endpoint administrativo desativado: configure ADMIN_TOKEN.'}), 403
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Token de administração ausente ou inválido.'}), 401
+    return None
 
-    try:
-        # Realiza a busca na coleção por documentos com 'tipo' igual a 'moradia'
-        cursor = collection.find({'tipo': 'moradia'}, {'idUsuarioMoradia': 1, '_id': 0})
-        logger.debug("Consulta MongoDB realizada com sucesso.")
-
-        uuid_list = []
-        for document in cursor:
-            binary_uuid = document.get('idUsuarioMoradia')
-            if binary_uuid:
-                # Converte o campo Binary para um objeto UUID
-                try:
-                    uuid_obj = uuid.UUID(bytes=binary_uuid)
-                    uuid_str = str(uuid_obj)
-                    uuid_list.append(uuid_str)
-                    logger.debug(f"UUID adicionado: {uuid_str}")
-                except (ValueError, TypeError) as e:
-                    logger.error(f"Erro ao converter UUID: {e}")
-        
-        logger.info(f"Total de moradias encontradas: {len(uuid_list)}")
-        return uuid_list
+# Verificação dos índices na inicialização: 'verify' (apenas avisa), 'ensure' (cria os ausentes),
+# 'require' (cria os ausentes e não inicia se algum continuar faltando) ou 'off'
+MONGO_INDEXES = getenv('MONGO_INDEXES', 'verify').lower()
 
-    except Exception as e:
-        logger.error(f"Ocorreu um erro ao buscar as moradias: {e}")
-        return []
+catalogue = HouseCatalogue()
+result_cache = RecommendationCache()
+catalogue.add_change_listener(result_cache.invalidate)
 
-def get_all_probas(university_uuid: str) -> list:
+def _reinit_after_fork() -> None:
+    _reset_mongo_after_fork()
+    for codes in CATEGORY_CODES.values():
+        codes.reinit_after_fork()
+    catalogue.reinit_after_fork()
+    result_cache.reinit_after_fork()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+_startup_lock = threading.Lock()
+_startup_done = False
+
+def startup(wait_for_catalogue: bool = False) -> None:
     """
-    Retorna uma lista de UUIDs das moradias ordenadas de forma decrescente com base nas probabilidades de correspondência.
+    Inicialização do servidor: verifica os índices e a busca por usuário no MongoDB (MONGO_INDEXES) e
+    inicia a sincronização do catálogo residente de moradias.
 
-    A função realiza os seguintes passos:
-    1. Obtém todas as moradias disponíveis.
-    2. Calcula a probabilidade de correspondência entre as preferências da moradia e as do universitário.
-    3. Cria um objeto com o UUID e a probabilidade.
+    Não é executada na importação do módulo, para que os comandos da CLI do Flask, o app_async e os
+    benchmarks não dependam do MongoDB ao importar a aplicação. É chamada uma única vez por processo
+    servidor: pelos hooks do Gunicorn (when_ready no mestre com preload, post_worker_init nos
+    workers), pelo before_serving do app_async e pelo servidor de desenvolvimento. Chamadas
+    seguintes, inclusive em workers herdados do mestre por fork, não fazem nada.
 
     Args:
-        university_uuid (str): O UUID do universitário no formato padrão (ex: '592f7f4a-ebd2-4b3a-7e46-7e1af20de594').
+        wait_for_catalogue (bool, opcional): Aguarda a carga inicial do catálogo (ver HouseCatalogue.start()).
+            Sem espera, as requisições consultam o MongoDB diretamente até o catálogo ser carregado.
 
-    Returns:
-        list: Uma lista de objetos contendo UUIDs das moradias e suas respectivas probabilidades.
+    Raises:
+        RuntimeError: No modo MONGO_INDEXES=require, se algum índice exigido não estiver disponível.
     """
-    logger.info(f"Iniciando cálculo de probabilidades para o UUID universitário: {university_uuid}")
-    try:
-        houses = get_all_houses()
-        houses_to_return = []
+    global _startup_done
+    with _startup_lock:
+        if _startup_done:
+            return
+        verify_mongo_setup(MONGO_INDEXES)
+        # Iniciado com qualquer SCORING_ENGINE: o endpoint em lote sempre calcula sobre o catálogo residente
+        catalogue.start(wait=wait_for_catalogue)
+        _startup_done = True
 
-        for house_uuid in houses:
-            housing_filters = get_filters(house_uuid)
-            university_filters = get_filters(university_uuid)
-            probability = calculate_match_percentage(housing_filters, university_filters)
-            logger.debug(f"Probabilidade para a moradia {house_uuid}: {probability}%")
-            
-            house = {"uid": house_uuid, "probability": probability}
+def init_worker() -> None:
+    """
+    Inicializa um processo worker do Gunicorn, depois que ele carregou a aplicação.
 
-            houses_to_return.append(house)
-            logger.info(f"Moradia {house_uuid} adicionada com probabilidade {probability}%")
+    Abre a conexão com o MongoDB do worker (aquecendo o pool), executa startup() se a aplicação não
+    foi pré-carregada no mestre e retoma a sincronização do catálogo herdado por fork, para que a
+    primeira requisição não pague esses custos. Chamado pelo hook post_worker_init do Gunicorn.
+    """
+    if _collection_override is None:
+        get_mongo_client()
+    startup()
+    catalogue.resume_after_fork()
 
-        # Ordena as moradias de forma decrescente com base nas probabilidades
-        logger.info("Moradias ordenadas com sucesso.")
 
-        return houses_to_return
+@app.route('/catalogue', methods=['GET'])
+@swag_from({
+    'tags': ['Catálogo de Moradias'],
+    'responses': {
+        200: {
+            'description': 'Métricas do catálogo residente de moradias.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'loaded': {'type': 'boolean'},
+                    'size': {'type': 'integer'},
+                    'distinct_profiles': {'type': 'integer'},
+                    'memory_bytes': {'type': 'integer'},
+                    'malformed': {
+                        'type': 'object',
+                        'description': 'Moradias com campos inválidos na última carga completa, por campo e no total (records)'
+                    },
+                    'version': {'type': 'integer'},
+                    'sync_mode': {'type': 'string'},
+                    'staleness_seconds': {'type': 'number'}
+                }
+            }
+        }
+    }
+})
+def catalogue_stats():
+    return jsonify(catalogue.stats()), 200
 
+@app.route('/catalogue/refresh', methods=['POST'])
+@swag_from({
+    'tags': ['Catálogo de Moradias'],
+    'description': (
+        'Recarrega o catálogo residente apenas no processo (worker) que atende a requisição. Com vários '
+        'workers, os demais continuam sincronizados pelo change stream ou pelas consultas periódicas. '
+        'Exige o cabeçalho "Authorization: Bearer <ADMIN_TOKEN>"; sem ADMIN_TOKEN configurado, o endpoint fica desativado.'
+    ),
+    'parameters': [
+        {
+            'name': 'Authorization',
+            'in': 'header',
+            'type': 'string',
+            'required': True,
+            'description': 'Token de administração no formato "Bearer <ADMIN_TOKEN>".'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Catálogo do worker recarregado com sucesso.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'size': {'type': 'integer'}
+                }
+            }
+        },
+        401: {
+            'description': 'Token de administração ausente ou inválido.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        403: {
+            'description': 'Endpoint desativado: ADMIN_TOKEN não configurado.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        500: {
+            'description': 'Erro interno do servidor.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'},
+                    'detalhes': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def catalogue_refresh():
+    denied = check_admin_token()
+    if denied is not None:
+        return denied
+    try:
+        size = catalogue.refresh()
     except Exception as e:
-        logger.error(f"Ocorreu um erro ao calcular as probabilidades: {e}")
-        return []
+        logger.error(f"Erro ao recarregar o catálogo de moradias: {e}")
+        return jsonify({'error': 'Não foi possível recarregar o catálogo.', 'detalhes': str(e)}), 500
+    return jsonify({'message': 'Catálogo recarregado com sucesso.', 'size': size}), 200
+
+@app.route('/cache', methods=['GET'])
+@swag_from({
+    'tags': ['Cache de Recomendações'],
+    'responses': {
+        200: {
+            'description': 'Métricas do cache de recomendações.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'size': {'type': 'integer'},
+                    'maxsize': {'type': 'integer'},
+                    'ttl_seconds': {'type': 'number'},
+                    'hits': {'type': 'integer'},
+                    'misses': {'type': 'integer'},
+                    'evictions': {'type': 'integer'},
+                    'expirations': {'type': 'integer'},
+                    'invalidations': {'type': 'integer'}
+                }
+            }
+        }
+    }
+})
+def cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+@app.route('/mongo', methods=['GET'])
+@swag_from({
+    'tags': ['MongoDB'],
+    'responses': {
+        200: {
+            'description': 'Métricas do pool de conexões com o MongoDB.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'open_connections': {'type': 'integer'},
+                    'checked_out': {'type': 'integer'},
+                    'checkouts': {'type': 'integer'},
+                    'checkout_failures': {'type': 'integer'},
+                    'checkout_wait_avg_ms': {'type': 'number'},
+                    'checkout_wait_max_ms': {'type': 'number'},
+                    'pool_clears': {'type': 'integer'},
+                    'options': {'type': 'object'}
+                }
+            }
+        }
+    }
+})
+def mongo_stats():
+    return jsonify({**pool_stats.stats(), 'options': mongo_client_options()}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+@swag_from({
+    'tags': ['Métricas'],
+    'produces': ['text/plain'],
+    'responses': {
+        200: {
+            'description': 'Métricas no formato de exposição do Prometheus: requisições e latência por rota, '
+                           'comandos e latência do MongoDB, moradias avaliadas, consultas ao cache de '
+                           'recomendações, tamanho do catálogo e, com STAGE_TIMING=true, os histogramas de '
+                           'hestia_stage_duration_seconds por etapa. Com PROMETHEUS_MULTIPROC_DIR, os valores '
+                           'de todos os workers do Gunicorn são agregados.'
+        }
+    }
+})
+def metrics():
+    return generate_latest(metrics_registry()), 200, {'Content-Type': CONTENT_TYPE_LATEST}
 
 
 @app.route('/recommended-homes', methods=['POST'])
@@ -289,6 +2783,22 @@ def get_all_probas(university_uuid: str) -> list:
                     'university_uuid': {
                         'type': 'string',
                         'description': 'UUID do universitário no formato padrão (ex: "592f7f4a-ebd2-4b3a-7e46-7e1af20de594")'
+                    },
+                    'limit': {
+                        'type': 'integer',
+                        'description': 'Número máximo de moradias retornadas (padrão: RECOMMENDATION_DEFAULT_LIMIT, máximo: RECOMMENDATION_MAX_LIMIT)'
+                    },
+                    'offset': {
+                        'type': 'integer',
+                        'description': 'Número de moradias a ignorar no início da ordenação (padrão: 0)'
+                    },
+                    'min_probability': {
+                        'type': 'number',
+                        'description': 'Probabilidade mínima, entre 0 e 100, das moradias retornadas (padrão: 0)'
+                    },
+                    'exclude_zero': {
+                        'type': 'boolean',
+                        'description': 'Omite as moradias com 0% de correspondência, descartando as incompatíveis por alergia já na consulta (padrão: false)'
                     }
                 },
                 'required': ['university_uuid']
@@ -310,7 +2820,7 @@ def get_all_probas(university_uuid: str) -> list:
                             'type': 'object',
                             'properties': {
                                 'uid': {'type': 'string'},
-                                'percentage': {'type': 'number'}
+                                'probability': {'type': 'number'}
                             }
                         }
                     }
@@ -344,24 +2854,208 @@ def get_all_probas(university_uuid: str) -> list:
                     'detalhes': {'type': 'string'}
                 }
             }
+        },
+        503: {
+            'description': 'MongoDB indisponível: a recomendação não foi calculada.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'},
+                    'detalhes': {'type': 'string'}
+                }
+            }
         }
     }
 })
 def recommended_homes():
     if not request.is_json:
         return jsonify({'error': 'Content-Type deve ser application/json.'}), 415
-    data = request.get_json()
-    university_uuid = data.get('university_uuid')
-    if not university_uuid:
-        return jsonify({'error': 'O campo "university_uuid" é obrigatório.'}), 400
+    params, error = parse_recommendation_request(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
     try:
-        uuid.UUID(university_uuid)
-    except ValueError:
-        return jsonify({'error': 'O "university_uuid" fornecido não é um UUID válido.'}), 400
-    houses = get_all_probas(university_uuid)
-    return jsonify({'message': 'Requisição recebida com sucesso.', 'houses': houses}), 200
+        houses = get_all_probas(**params)
+    except PyMongoError as e:
+        logger.error(f"Erro do MongoDB ao calcular as probabilidades: {e}")
+        return jsonify({'error': 'MongoDB indisponível.', 'detalhes': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Ocorreu um erro ao calcular as probabilidades: {e}")
+        return jsonify({'error': 'Não foi possível calcular as recomendações.', 'detalhes': str(e)}), 500
+    with timed_stage('serialization'):
+        response = jsonify({'message': 'Requisição recebida com sucesso.', 'houses': houses})
+    return response, 200
+
+@app.route('/recommended-homes/batch', methods=['POST'])
+@swag_from({
+    'tags': ['Recomendações de Moradias'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'university_uuids': {
+                        'type': 'array',
+                        'items': {'type': 'string'},
+                        'description': 'UUIDs dos universitários no formato padrão (máximo: RECOMMENDATION_MAX_BATCH_SIZE)'
+                    },
+                    'limit': {
+                        'type': 'integer',
+                        'description': 'Número máximo de moradias retornadas por universitário (padrão: RECOMMENDATION_DEFAULT_LIMIT, máximo: RECOMMENDATION_MAX_LIMIT)'
+                    },
+                    'offset': {
+                        'type': 'integer',
+                        'description': 'Número de moradias a ignorar no início da ordenação de cada universitário (padrão: 0)'
+                    },
+                    'min_probability': {
+                        'type': 'number',
+                        'description': 'Probabilidade mínima, entre 0 e 100, das moradias retornadas (padrão: 0)'
+                    },
+                    'exclude_zero': {
+                        'type': 'boolean',
+                        'description': 'Omite as moradias com 0% de correspondência (padrão: false)'
+                    }
+                },
+                'required': ['university_uuids']
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Requisição bem-sucedida. Os resultados seguem a ordem de "university_uuids", sem repetições; '
+                           'universitários não encontrados são avaliados com filtros vazios e listados em "not_found".',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {
+                        'type': 'string'
+                    },
+                    'results': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'university_uuid': {'type': 'string'},
+                                'houses': {
+                                    'type': 'array',
+                                    'items': {
+                                        'type': 'object',
+                                        'properties': {
+                                            'uid': {'type': 'string'},
+                                            'probability': {'type': 'number'}
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    'not_found': {
+                        'type': 'array',
+                        'items': {'type': 'string'}
+                    }
+                }
+            }
+        },
+        400: {
+            'description': 'Erro de requisição inválida.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        415: {
+            'description': 'Tipo de mídia não suportado.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
+        500: {
+            'description': 'Erro interno do servidor.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'},
+                    'detalhes': {'type': 'string'}
+                }
+            }
+        },
+        503: {
+            'description': 'MongoDB indisponível: nenhuma recomendação foi calculada.',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'},
+                    'detalhes': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+def recommended_homes_batch():
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type deve ser application/json.'}), 415
+    params, error = parse_batch_recommendation_request(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+    summary = {}
+    try:
+        recommendations = get_all_probas_batch(**params, summary=summary)
+    except PyMongoError as e:
+        logger.error(f"Erro do MongoDB ao calcular as recomendações em lote: {e}")
+        return jsonify({'error': 'MongoDB indisponível.', 'detalhes': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Ocorreu um erro ao calcular as recomendações em lote: {e}")
+        return jsonify({'error': 'Não foi possível calcular as recomendações.', 'detalhes': str(e)}), 500
+    with timed_stage('serialization'):
+        response = jsonify({
+            'message': 'Requisição recebida com sucesso.',
+            'results': [
+                {'university_uuid': university_uuid, 'houses': houses} for university_uuid, houses in recommendations.items()
+            ],
+            'not_found': summary.get('not_found', [])
+        })
+    return response, 200
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Cria os índices exigidos pela aplicação que ainda não existem."""
+    for name, status in check_indexes(create=True).items():
+        click.echo(f"{name}: {status}")
+
+@app.cli.command('explain-catalogue')
+def explain_catalogue_command():
+    """Mostra as estatísticas de execução (explain) da consulta do catálogo de moradias."""
+    for key, value in explain_catalogue_query().items():
+        click.echo(f"{key}: {value}")
+
+@app.cli.command('check-lookup')
+@click.option('--samples', default=20, show_default=True, help='Número de buscas cronometradas.')
+def check_lookup_command(samples):
+    """Mede a latência da busca de um usuário por 'idUsuarioMoradia'."""
+    for key, value in check_user_lookup(samples).items():
+        click.echo(f"{key}: {value}")
+
+@app.cli.command('parity-check')
+@click.option('--students', default=50, show_default=True, help='Número máximo de universitários comparados.')
+def parity_check_command(students):
+    """Compara o motor de agregação com o cálculo em Python e falha se houver divergências."""
+    result = check_scoring_parity(students)
+    for example in result.pop('examples'):
+        click.echo(f"Divergência: {example}")
+    for key, value in result.items():
+        click.echo(f"{key}: {value}")
+    if result['mismatches']:
+        raise SystemExit(1)
 
 if __name__ == '__main__':
-    # Executa a aplicação Flask na porta 5000 com debug ativado
-    app.run(debug=True, host='0.0.0.0', port=int(getenv("PORT", 5000)))
+    # Servidor de desenvolvimento do Flask. Em produção, use o Gunicorn: gunicorn -c gunicorn.conf.py app:app
+    startup()
+    app.run(debug=getenv('FLASK_DEBUG', 'false').lower() == 'true', host='0.0.0.0', port=int(getenv("PORT", 5000)))
 
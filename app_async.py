@@ -0,0 +1,175 @@
+"""
+Variante assíncrona (ASGI) do endpoint /recommended-homes.
+
+Executa o mesmo pipeline de app.py (catálogo residente, cache de recomendações e cálculo vetorizado),
+mas a busca do perfil do universitário usa o AsyncMongoClient do PyMongo. Assim, muitas requisições
+concorrentes compartilham um único event loop por processo e suas consultas ao MongoDB são
+sobrepostas, em vez de cada uma ocupar uma thread bloqueada. O contrato JSON é o mesmo de app.py,
+documentado em /docs.
+
+Uso:
+    hypercorn app_async:app --bind 0.0.0.0:5000 --workers 2
+"""
+import asyncio
+import time
+import uuid
+from os import getenv
+
+from bson import Binary
+from pymongo import AsyncMongoClient
+from pymongo.errors import PyMongoError
+from quart import Quart, g, jsonify, request
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app import (
+    AGGREGATION_ENGINE,
+    STAGE_TIMING,
+    command_metrics,
+    compile_profile,
+    extract_filters,
+    finish_recommendation,
+    finish_stage_timing,
+    houses_from_aggregation,
+    logger,
+    metrics_registry,
+    mongo_client_options,
+    parse_recommendation_request,
+    pool_stats,
+    rank_recommendation,
+    ranking_pipeline,
+    record_request_metrics,
+    start_recommendation,
+    start_stage_timing,
+    startup,
+    timed_stage
+)
+
+app = Quart(__name__)
+
+async_client = None
+async_collection = None
+
+
+@app.before_serving
+async def connect_mongo():
+    global async_client, async_collection
+    # Verificação do MongoDB de app.py, executada fora do event loop por usar o cliente síncrono
+    await asyncio.to_thread(startup)
+    async_client = AsyncMongoClient(
+        getenv('URI_MONGODB'), event_listeners=[pool_stats, command_metrics], **mongo_client_options()
+    )
+    async_collection = async_client[getenv('MONGO_DBNAME')][getenv('MONGO_COLLECTION')]
+    logger.info("Conexão assíncrona com o MongoDB estabelecida com sucesso.")
+
+
+@app.after_serving
+async def close_mongo():
+    if async_client is not None:
+        await async_client.close()
+
+
+@app.before_request
+async def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+
+
+@app.after_request
+async def finish_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        record_request_metrics(request.url_rule, request.method, response.status_code, started)
+    return response
+
+
+if STAGE_TIMING:
+    # Hooks assíncronos: o Quart executaria hooks síncronos em outra thread, fora do contexto da requisição
+    @app.before_request
+    async def before_request_timing():
+        start_stage_timing()
+
+    @app.after_request
+    async def after_request_timing(response):
+        return finish_stage_timing(response)
+
+
+async def get_filters_async(uuid_str: str) -> dict:
+    """
+    Versão assíncrona de app.get_filters: busca o usuário pelo UUID e retorna seu dicionário de filtros.
+
+    Args:
+        uuid_str (str): O UUID do usuário no formato padrão (ex: '592f7f4a-ebd2-4b3a-7e46-7e1af20de594').
+
+    Returns:
+        dict: O dicionário de filtros do usuário, ou um dicionário vazio se ele não for encontrado.
+
+    Raises:
+        PyMongoError: Erros do MongoDB são propagados, como em app.get_filters.
+    """
+    try:
+        uuid_obj = uuid.UUID(uuid_str)
+    except ValueError:
+        logger.error("UUID inválido fornecido.")
+        return {}
+
+    with timed_stage('filters'):
+        user = await async_collection.find_one({'idUsuarioMoradia': Binary(uuid_obj.bytes, subtype=4)})
+    if not user:
+        logger.warning("Nenhum usuário encontrado com o UUID fornecido.")
+        return {}
+    return extract_filters(user)
+
+
+async def get_all_probas_async(university_uuid: str, limit=None, offset: int = 0,
+                               min_probability: float = 0.0, exclude_zero: bool = False) -> list:
+    """
+    Versão assíncrona de app.get_all_probas, com os mesmos argumentos e o mesmo retorno.
+
+    Usa as mesmas etapas de app.py (start_recommendation, rank_recommendation e finish_recommendation);
+    apenas a busca do perfil do universitário é assíncrona. Se o catálogo residente ainda não estiver
+    carregado, a consulta das moradias (síncrona) é executada em uma thread para não bloquear o loop.
+    Com SCORING_ENGINE=aggregation, o pipeline de agregação também é executado pelo cliente assíncrono.
+    Erros do MongoDB são propagados, como em app.get_all_probas.
+    """
+    recommendation, cached = start_recommendation(university_uuid, limit, offset, min_probability, exclude_zero)
+    if cached is not None:
+        return cached
+
+    university_profile = compile_profile(await get_filters_async(university_uuid))
+    filters_done = time.perf_counter()
+
+    if AGGREGATION_ENGINE:
+        houses_to_return = []
+        pipeline = ranking_pipeline(university_profile, limit, offset, min_probability, exclude_zero)
+        if pipeline is not None:
+            with timed_stage('aggregation'):
+                cursor = await async_collection.aggregate(pipeline)
+                houses_to_return = houses_from_aggregation(await cursor.to_list(None))
+    elif recommendation.snapshot is not None:
+        houses_to_return = rank_recommendation(recommendation, university_profile)
+    else:
+        houses_to_return = await asyncio.to_thread(rank_recommendation, recommendation, university_profile)
+    return finish_recommendation(recommendation, houses_to_return, filters_done)
+
+@app.route('/recommended-homes', methods=['POST'])
+async def recommended_homes():
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type deve ser application/json.'}), 415
+    params, error = parse_recommendation_request(await request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        houses = await get_all_probas_async(**params)
+    except PyMongoError as e:
+        logger.error(f"Erro do MongoDB ao calcular as probabilidades: {e}")
+        return jsonify({'error': 'MongoDB indisponível.', 'detalhes': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Ocorreu um erro ao calcular as probabilidades: {e}")
+        return jsonify({'error': 'Não foi possível calcular as recomendações.', 'detalhes': str(e)}), 500
+    with timed_stage('serialization'):
+        response = jsonify({'message': 'Requisição recebida com sucesso.', 'houses': houses})
+    return response, 200
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return generate_latest(metrics_registry()), 200, {'Content-Type': CONTENT_TYPE_LATEST}
@@ -0,0 +1,35 @@
+"""
+Importação da aplicação pelos benchmarks, com a configuração de ambiente comum a todos eles.
+"""
+import importlib
+from os import environ
+from types import ModuleType
+from typing import Optional
+
+# Usados apenas quando a variável não está definida no ambiente
+DEFAULTS = {
+    'URI_MONGODB': 'mongodb://localhost:27017/?serverSelectionTimeoutMS=100',
+    'MONGO_DBNAME': 'hestia_benchmark',
+    'MONGO_COLLECTION': 'usuarios',
+}
+
+
+def load_app(defaults: Optional[dict] = None) -> ModuleType:
+    """
+    Configura o ambiente dos benchmarks e importa o módulo app.
+
+    Os benchmarks substituem a coleção com app.set_collection() e carregam o catálogo explicitamente,
+    então a sincronização em segundo plano e a verificação dos índices são sempre desativadas, mesmo
+    que app.startup() seja chamado (por exemplo, pelos hooks do Gunicorn com benchmarks.standin).
+
+    Args:
+        defaults (dict, opcional): Valores padrão adicionais, que também não substituem variáveis já definidas.
+
+    Returns:
+        ModuleType: O módulo app.
+    """
+    for name, value in {**DEFAULTS, **(defaults or {})}.items():
+        environ.setdefault(name, value)
+    environ['CATALOGUE_SYNC_MODE'] = 'off'
+    environ['MONGO_INDEXES'] = 'off'
+    return importlib.import_module('app')
@@ -0,0 +1,37 @@
+"""
+Mede como o throughput de /recommended-homes escala com o número de clientes concorrentes.
+
+Uso:
+    python -m benchmarks.concurrency --url http://127.0.0.1:5000 --levels 1 4 16 64 --duration 10
+"""
+import argparse
+
+from benchmarks.generator import document_uuid, generate_users
+from benchmarks.load import run_load
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--houses', type=int, default=10000, help='Mesmo valor de BENCH_HOUSES no servidor.')
+    parser.add_argument('--students', type=int, default=1000, help='Mesmo valor de BENCH_STUDENTS no servidor.')
+    parser.add_argument('--seed', type=int, default=42, help='Mesmo valor de BENCH_SEED no servidor.')
+    args = parser.parse_args()
+
+    _, student_documents = generate_users(args.houses, args.students, args.seed)
+    students = [document_uuid(document) for document in student_documents]
+
+    print('| Concorrência | req/s | p50 | p95 | p99 | erros |')
+    print('|---|---|---|---|---|---|')
+    for concurrency in args.levels:
+        result = run_load(args.url, students, concurrency, args.duration)
+        print(
+            f"| {concurrency} | {result['throughput']:.1f} | {result['p50_ms']:.1f} ms | "
+            f"{result['p95_ms']:.1f} ms | {result['p99_ms']:.1f} ms | {result['errors']} |"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Gerador determinístico de usuários (moradias e universitários) para os benchmarks.
+
+Os documentos seguem o formato armazenado no MongoDB, com os vocabulários reais dos campos de filtro.
+"""
+import random
+import uuid
+
+from bson import Binary
+
+ANIMAL_VALUES = ['Alergia', 'Gosto muito', 'Não tenho, mas amo', 'Não gosto', 'Indiferente']
+GENDER_VALUES = ['Tanto faz', 'Feminino', 'Masculino']
+FREQUENCY_VALUES = ['Nunca', 'Raramente', 'Às vezes', 'Frequentemente']
+
+
+def generate_user(rng: random.Random, tipo: str) -> dict:
+    """Gera um documento de usuário com os campos de filtro no formato armazenado no MongoDB."""
+    return {
+        'tipo': tipo,
+        'idUsuarioMoradia': Binary(uuid.UUID(int=rng.getrandbits(128), version=4).bytes, subtype=4),
+        'animais_estimacao': f"[{rng.choice(ANIMAL_VALUES)}]",
+        'preferencia_genero': rng.choice(GENDER_VALUES),
+        'numero_maximo_pessoas': rng.randint(1, 6),
+        'frequencia_fumo': rng.choice(FREQUENCY_VALUES),
+        'frequencia_bebida': rng.choice(FREQUENCY_VALUES)
+    }
+
+
+def generate_users(houses: int, students: int, seed: int = 42) -> tuple:
+    """
+    Gera moradias e universitários de forma determinística para a semente informada.
+
+    Returns:
+        tuple: (lista de documentos de moradias, lista de documentos de universitários).
+    """
+    rng = random.Random(seed)
+    house_documents = [generate_user(rng, 'moradia') for _ in range(houses)]
+    student_documents = [generate_user(rng, 'universitario') for _ in range(students)]
+    return house_documents, student_documents
+
+
+def document_uuid(document: dict) -> str:
+    """Retorna o UUID (str) de um documento gerado."""
+    return str(uuid.UUID(bytes=document['idUsuarioMoradia']))
@@ -0,0 +1,108 @@
+"""
+Gerador de carga HTTP para o endpoint /recommended-homes.
+
+Cada thread mantém uma conexão keep-alive e envia requisições com UUIDs de universitários
+gerados pela mesma semente usada em benchmarks.standin.
+
+Uso:
+    python -m benchmarks.load --url http://127.0.0.1:5000 --concurrency 16 --duration 30
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from benchmarks.generator import document_uuid, generate_users
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Retorna o percentil (0 a 1) de uma lista já ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url: str, students: list, concurrency: int, duration: float, path: str = '/recommended-homes',
+             body: dict = None) -> dict:
+    """
+    Envia requisições concorrentes durante 'duration' segundos e retorna throughput e latências.
+
+    Returns:
+        dict: requests, errors, throughput (req/s) e latências p50/p95/p99 em milissegundos.
+    """
+    target = urlparse(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            payload = json.dumps({'university_uuid': rng.choice(students), **(body or {})})
+            started = time.perf_counter()
+            try:
+                connection.request('POST', path, payload, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                continue
+            local_latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--houses', type=int, default=10000, help='Mesmo valor de BENCH_HOUSES no servidor.')
+    parser.add_argument('--students', type=int, default=1000, help='Mesmo valor de BENCH_STUDENTS no servidor.')
+    parser.add_argument('--seed', type=int, default=42, help='Mesmo valor de BENCH_SEED no servidor.')
+    args = parser.parse_args()
+
+    _, student_documents = generate_users(args.houses, args.students, args.seed)
+    students = [document_uuid(document) for document in student_documents]
+    result = run_load(args.url, students, args.concurrency, args.duration)
+    print(
+        f"{result['requests']} requisições, {result['errors']} erros, "
+        f"{result['throughput']:.1f} req/s, p50 {result['p50_ms']:.1f} ms, "
+        f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Compara a memória ocupada pelo catálogo de moradias em três representações.
+
+- Dicionários de filtros: UUID (str) → dicionário de filtros, no formato de get_filters().
+- Perfis: UUID (str) → MatchProfile, a representação anterior do catálogo residente.
+- Colunas: HouseColumns, com o UUID em 16 bytes, o código do perfil em um vocabulário de perfis distintos
+  e o '_id' do documento em 12 bytes.
+
+Os documentos passam por uma codificação e decodificação BSON, para que cada moradia tenha as suas
+próprias strings, como acontece com os documentos lidos do MongoDB.
+
+Uso:
+    python -m benchmarks.memory --houses 10000 100000 1000000
+"""
+import argparse
+import gc
+import tracemalloc
+import uuid
+
+import bson
+from bson import ObjectId
+
+from benchmarks.bootstrap import load_app
+from benchmarks.generator import generate_users
+
+hestia = load_app()
+
+
+def decoded_documents(documents: list):
+    """Gera cópias dos documentos decodificadas de BSON, uma de cada vez."""
+    for document in documents:
+        yield bson.decode(bson.encode(document))
+
+
+def build_filters(documents: list) -> dict:
+    return {str(uuid.UUID(bytes=document['idUsuarioMoradia'])): hestia.extract_filters(document)
+            for document in decoded_documents(documents)}
+
+
+def build_profiles(documents: list) -> dict:
+    return {str(uuid.UUID(bytes=document['idUsuarioMoradia'])): hestia.compile_profile(hestia.extract_filters(document))
+            for document in decoded_documents(documents)}
+
+
+def build_columns(documents: list) -> 'hestia.HouseColumns':
+    profiles = {}
+    document_ids = {}
+    for document in decoded_documents(documents):
+        house_uuid = bytes(document['idUsuarioMoradia'])
+        profiles[house_uuid] = hestia.compile_profile(hestia.extract_filters(document))
+        document_ids[house_uuid] = document.get('_id', ObjectId())
+    return hestia.HouseColumns.from_profiles(profiles, document_ids=document_ids)
+
+
+def measure(build, documents: list) -> int:
+    """Retorna quantos bytes a estrutura criada por build() mantém alocados."""
+    gc.collect()
+    tracemalloc.start()
+    structure = build(documents)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--houses', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    representations = [('Dicionários de filtros', build_filters), ('Perfis', build_profiles), ('Colunas', build_columns)]
+    print('| Moradias | Representação | Memória | Bytes por moradia |')
+    print('|---|---|---|---|')
+    for houses in args.houses:
+        documents, _ = generate_users(houses, 0, args.seed)
+        for name, build in representations:
+            size = measure(build, documents)
+            print(f"| {houses} | {name} | {size / 2 ** 20:.1f} MiB | {size / houses:.0f} |")
+
+
+if __name__ == '__main__':
+    main()
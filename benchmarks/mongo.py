@@ -0,0 +1,74 @@
+"""
+Coleções de usuários para os benchmarks: uma coleção mongomock em memória ou um MongoDB local.
+
+Ambas são populadas com os documentos de benchmarks.generator para a semente informada.
+"""
+import time
+
+import mongomock
+from pymongo import MongoClient
+
+from benchmarks.generator import generate_users
+
+
+class IndexedCollection:
+    """
+    Coleção mongomock com buscas por 'idUsuarioMoradia' em O(1), no lugar do índice único do MongoDB.
+
+    O mongomock não usa índices: sem este atalho, cada find_one (e cada find com $in) percorreria a
+    coleção inteira e o benchmark mediria o mongomock, não a API. As demais operações são delegadas à coleção original.
+    """
+
+    def __init__(self, collection, latency: float = 0.0):
+        self._collection = collection
+        self._by_uuid = {document['idUsuarioMoradia']: document for document in collection.find({})}
+        self.latency = latency
+
+    def lookup(self, filter: dict):
+        """Retorna uma cópia do documento com o 'idUsuarioMoradia' do filtro, ou None."""
+        document = self._by_uuid.get(filter['idUsuarioMoradia'])
+        return dict(document) if document is not None else None
+
+    def find_one(self, filter=None, *args, **kwargs):
+        if filter and set(filter) == {'idUsuarioMoradia'} and not args and not kwargs:
+            if self.latency:
+                time.sleep(self.latency)
+            return self.lookup(filter)
+        return self._collection.find_one(filter, *args, **kwargs)
+
+    def find(self, filter=None, projection=None, *args, **kwargs):
+        # Busca em lote por 'idUsuarioMoradia' com $in, como em get_filters_batch()
+        uuids = filter.get('idUsuarioMoradia') if filter and set(filter) == {'idUsuarioMoradia'} else None
+        if isinstance(uuids, dict) and set(uuids) == {'$in'} and not args and not kwargs:
+            if self.latency:
+                time.sleep(self.latency)
+            documents = (self._by_uuid.get(key) for key in uuids['$in'])
+            fields = [field for field, included in (projection or {}).items() if included]
+            return [{field: document[field] for field in fields if field in document} if fields else dict(document)
+                    for document in documents if document is not None]
+        return self._collection.find(filter, projection, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def mongomock_collection(dbname: str, collection_name: str, houses: int, students: int, seed: int,
+                         latency: float = 0.0) -> IndexedCollection:
+    """Cria uma coleção em memória com as moradias e os universitários gerados para a semente."""
+    collection = mongomock.MongoClient()[dbname][collection_name]
+    house_documents, student_documents = generate_users(houses, students, seed)
+    collection.insert_many(house_documents + student_documents)
+    return IndexedCollection(collection, latency)
+
+
+def mongod_collection(uri: str, dbname: str, collection_name: str, houses: int, students: int, seed: int):
+    """
+    Recria a coleção em um MongoDB (por exemplo, um mongod local) com os usuários gerados para a semente.
+
+    A coleção é apagada antes da carga. Os índices devem ser criados depois, com app.check_indexes(create=True).
+    """
+    collection = MongoClient(uri)[dbname][collection_name]
+    collection.drop()
+    house_documents, student_documents = generate_users(houses, students, seed)
+    collection.insert_many(house_documents + student_documents, ordered=False)
+    return collection
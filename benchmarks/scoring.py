@@ -0,0 +1,161 @@
+"""
+Micro-benchmark e perfil do cálculo de correspondência entre moradias e universitários.
+
+Gera --houses moradias e --students universitários com benchmarks.generator e calcula o percentual
+de todos os pares (moradias × universitários) com uma das implementações:
+
+- dict: calculate_match_percentage(), a partir dos dicionários de filtros (inclui compile_profile()).
+- scalar: score_profiles(), sobre perfis já compilados.
+- batch: batch_match_percentages(), uma chamada vetorizada por universitário sobre todas as moradias.
+
+Reporta o tempo por par (melhor de --repeat execuções) e, em uma execução separada com tracemalloc
+sobre --trace-pairs pares, os bytes alocados por par (pico acima da memória em uso antes de cada chamada).
+Com --compare, mede todas as implementações; com --profile, executa a implementação sob o cProfile
+e lista as funções mais custosas (--profile-output grava as estatísticas para o snakeviz ou o pstats).
+
+Para um perfil por amostragem, execute o módulo sob um profiler externo, por exemplo:
+    py-spy record -o perfil.svg -- python -m benchmarks.scoring --impl dict
+
+Uso:
+    python -m benchmarks.scoring --houses 2000 --students 500 --impl scalar
+    python -m benchmarks.scoring --compare
+    python -m benchmarks.scoring --impl dict --profile --top 15
+"""
+import argparse
+import copy
+import cProfile
+import pstats
+import time
+import tracemalloc
+
+from benchmarks.bootstrap import load_app
+from benchmarks.generator import generate_users
+
+hestia = load_app()
+
+IMPLEMENTATIONS = ('dict', 'scalar', 'batch')
+
+
+class Workload:
+    """Filtros, perfis e a matriz das moradias geradas, preparados antes da medição."""
+
+    def __init__(self, houses: int, students: int, seed: int):
+        house_documents, student_documents = generate_users(houses, students, seed)
+        self.house_filters = [hestia.extract_filters(document) for document in house_documents]
+        self.student_filters = [hestia.extract_filters(document) for document in student_documents]
+        self.house_profiles = [hestia.compile_profile(filters) for filters in self.house_filters]
+        self.student_profiles = [hestia.compile_profile(filters) for filters in self.student_filters]
+        self.house_matrix = hestia.encode_profiles(self.house_profiles)
+
+    @property
+    def pairs(self) -> int:
+        return len(self.house_filters) * len(self.student_filters)
+
+    def student(self, index: int) -> 'Workload':
+        """Retorna uma cópia do Workload com apenas o universitário da posição 'index'."""
+        subset = copy.copy(self)
+        subset.student_filters = self.student_filters[index:index + 1]
+        subset.student_profiles = self.student_profiles[index:index + 1]
+        return subset
+
+
+def run_dict(workload: Workload, students: int) -> None:
+    calculate = hestia.calculate_match_percentage
+    for student_filters in workload.student_filters[:students]:
+        for house_filters in workload.house_filters:
+            calculate(house_filters, student_filters)
+
+
+def run_scalar(workload: Workload, students: int) -> None:
+    score = hestia.score_profiles
+    for student_profile in workload.student_profiles[:students]:
+        for house_profile in workload.house_profiles:
+            score(house_profile, student_profile)
+
+
+def run_batch(workload: Workload, students: int) -> None:
+    for student_profile in workload.student_profiles[:students]:
+        hestia.batch_match_percentages(workload.house_matrix, student_profile)
+
+
+RUNNERS = {'dict': run_dict, 'scalar': run_scalar, 'batch': run_batch}
+
+
+def time_per_pair(impl: str, workload: Workload, repeat: int) -> float:
+    """Retorna o melhor tempo por par, em nanossegundos, de 'repeat' execuções sobre todos os pares."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        RUNNERS[impl](workload, len(workload.student_filters))
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / workload.pairs
+
+
+def bytes_per_pair(impl: str, workload: Workload, trace_pairs: int) -> float:
+    """
+    Retorna os bytes alocados por par, medidos com tracemalloc sobre cerca de 'trace_pairs' pares.
+
+    Para cada universitário, mede o pico de memória acima da memória em uso antes do cálculo com
+    todas as moradias e divide a soma pelo número de pares calculados.
+    """
+    houses = len(workload.house_filters)
+    students = max(1, min(len(workload.student_filters), trace_pairs // houses))
+    total = 0
+    tracemalloc.start()
+    for index in range(students):
+        subset = workload.student(index)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        RUNNERS[impl](subset, 1)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - current
+    tracemalloc.stop()
+    return total / (students * houses)
+
+
+def profile(impl: str, workload: Workload, top: int, sort: str, output: str = None) -> None:
+    """Executa a implementação sob o cProfile e imprime as 'top' funções mais custosas."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    RUNNERS[impl](workload, len(workload.student_filters))
+    profiler.disable()
+    if output:
+        profiler.dump_stats(output)
+    pstats.Stats(profiler).strip_dirs().sort_stats(sort).print_stats(top)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--houses', type=int, default=2000)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--impl', choices=IMPLEMENTATIONS, default='dict')
+    parser.add_argument('--compare', action='store_true', help='Mede todas as implementações.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--trace-pairs', type=int, default=100000, help='Pares medidos com tracemalloc. 0 desativa.')
+    parser.add_argument('--profile', action='store_true', help='Executa a implementação sob o cProfile.')
+    parser.add_argument('--profile-output', help='Grava as estatísticas do cProfile neste arquivo.')
+    parser.add_argument('--sort', default='cumulative', help='Ordenação das estatísticas do cProfile.')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    hestia.logger.disabled = True
+    workload = Workload(args.houses, args.students, args.seed)
+
+    if args.profile:
+        profile(args.impl, workload, args.top, args.sort, args.profile_output)
+        return
+
+    print(f"{workload.pairs} pares ({args.houses} moradias × {args.students} universitários, "
+          f"{len(workload.house_matrix.allergy)} perfis distintos de moradias)")
+    print('| Implementação | ns/par | pares/s | bytes/par |')
+    print('|---|---|---|---|')
+    for impl in (IMPLEMENTATIONS if args.compare else (args.impl,)):
+        nanoseconds = time_per_pair(impl, workload, args.repeat)
+        allocated = f"{bytes_per_pair(impl, workload, args.trace_pairs):.1f}" if args.trace_pairs else '-'
+        print(f"| {impl} | {nanoseconds:.1f} | {1e9 / nanoseconds:,.0f} | {allocated} |")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Aplicação de benchmark que substitui o MongoDB por uma coleção em memória (mongomock).
+
+Uso com o servidor de produção:
+    BENCH_HOUSES=10000 gunicorn -c gunicorn.conf.py benchmarks.standin:app
+
+Variáveis de ambiente:
+    BENCH_HOUSES: Número de moradias geradas. Padrão: 10000.
+    BENCH_STUDENTS: Número de universitários gerados. Padrão: 1000.
+    BENCH_SEED: Semente do gerador, para que todos os workers gerem os mesmos dados. Padrão: 42.
+    BENCH_MONGO_LATENCY_MS: Latência simulada de cada find_one, em milissegundos. Padrão: 0.
+"""
+from os import getenv
+
+from benchmarks.bootstrap import load_app
+from benchmarks.mongo import IndexedCollection, mongomock_collection
+
+# O catálogo é carregado (e os índices ignorados) depois que a coleção em memória substitui a do MongoDB
+hestia = load_app()
+
+
+def build_collection(houses: int, students: int, seed: int) -> IndexedCollection:
+    """Cria uma coleção em memória com as moradias e os universitários gerados para a semente."""
+    return mongomock_collection(
+        getenv('MONGO_DBNAME'), getenv('MONGO_COLLECTION'), houses, students, seed,
+        float(getenv('BENCH_MONGO_LATENCY_MS', 0)) / 1000
+    )
+
+
+hestia.set_collection(build_collection(
+    int(getenv('BENCH_HOUSES', 10000)), int(getenv('BENCH_STUDENTS', 1000)), int(getenv('BENCH_SEED', 42))
+))
+hestia.catalogue.refresh()
+
+app = hestia.app
@@ -0,0 +1,35 @@
+"""
+Stand-in de benchmark para a variante assíncrona (app_async), com a mesma coleção em memória de benchmarks.standin.
+
+Uso:
+    BENCH_MONGO_LATENCY_MS=20 hypercorn benchmarks.standin_async:app --bind 127.0.0.1:5000
+
+Aceita as mesmas variáveis de ambiente de benchmarks.standin. A latência simulada de find_one
+é aguardada com asyncio.sleep, como uma consulta do AsyncMongoClient.
+"""
+import asyncio
+
+from benchmarks import standin
+
+import app_async
+
+
+class AsyncIndexedCollection:
+    """Expõe find_one assíncrono sobre a coleção indexada de benchmarks.standin."""
+
+    def __init__(self, collection: standin.IndexedCollection):
+        self._collection = collection
+
+    async def find_one(self, filter=None):
+        if self._collection.latency:
+            await asyncio.sleep(self._collection.latency)
+        return self._collection.lookup(filter)
+
+
+@app_async.app.before_serving
+async def use_standin_collection():
+    # Registrada depois de app_async.connect_mongo, substitui a coleção criada por ela
+    app_async.async_collection = AsyncIndexedCollection(standin.hestia.get_collection())
+
+
+app = app_async.app
@@ -0,0 +1,166 @@
+"""
+Suíte de benchmarks reprodutível de get_all_probas() e do endpoint /recommended-homes.
+
+Para cada tamanho de catálogo (--houses), gera as moradias e os universitários com benchmarks.generator,
+carrega os documentos em uma coleção mongomock (padrão) ou em um MongoDB local (--uri), carrega o
+catálogo residente e mede, no mesmo processo:
+
+- get_all_probas: a função de recomendação, sem a camada HTTP;
+- /recommended-homes: o endpoint completo, pelo cliente de testes do Flask.
+
+O cache de recomendações é desativado (RESULT_CACHE_MAXSIZE=0), para que toda chamada calcule as
+recomendações, e os logs INFO por requisição são omitidos. Com --save, os resultados são gravados em
+JSON; com --baseline, são comparados aos de uma execução anterior e o processo termina com status 1
+se o p95 piorar ou o throughput cair mais que --tolerance em alguma medição.
+
+Uso:
+    python -m benchmarks.suite --houses 1000 10000 100000 --requests 2000
+    python -m benchmarks.suite --uri mongodb://localhost:27017 --save baseline.json
+    python -m benchmarks.suite --uri mongodb://localhost:27017 --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+from os import environ
+
+from benchmarks.bootstrap import load_app
+from benchmarks.generator import document_uuid, generate_users
+from benchmarks.load import percentile
+from benchmarks.mongo import mongod_collection, mongomock_collection
+
+hestia = load_app({'RESULT_CACHE_MAXSIZE': '0'})
+
+
+def load_catalogue(args, houses: int) -> float:
+    """Popula a coleção com 'houses' moradias, carrega o catálogo e retorna o tempo de preparação, em segundos."""
+    started = time.perf_counter()
+    if args.uri:
+        hestia.set_collection(mongod_collection(
+            args.uri, environ['MONGO_DBNAME'], environ['MONGO_COLLECTION'], houses, args.students, args.seed
+        ))
+        hestia.check_indexes(create=True)
+    else:
+        hestia.set_collection(mongomock_collection(
+            environ['MONGO_DBNAME'], environ['MONGO_COLLECTION'], houses, args.students, args.seed
+        ))
+    hestia.catalogue.refresh()
+    hestia.result_cache.clear()
+    return time.perf_counter() - started
+
+
+def measure(call, students: list, requests: int, warmup: int, seed: int) -> dict:
+    """
+    Executa call(uuid) sequencialmente com universitários sorteados e retorna throughput e latências.
+
+    call deve retornar True se a chamada foi bem-sucedida.
+
+    Returns:
+        dict: requests, errors, throughput (chamadas/s) e latências p50/p95/p99 em milissegundos.
+    """
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        call(rng.choice(students))
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        student = rng.choice(students)
+        call_started = time.perf_counter()
+        if not call(student):
+            errors += 1
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput': requests / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000
+    }
+
+
+def run_suite(args) -> list:
+    """Mede as duas funções para cada tamanho de catálogo e retorna uma linha de resultado por medição."""
+    client = hestia.app.test_client()
+
+    def call_function(student: str) -> bool:
+        return bool(hestia.get_all_probas(student, limit=args.limit))
+
+    def call_endpoint(student: str) -> bool:
+        response = client.post('/recommended-homes', json={'university_uuid': student, 'limit': args.limit})
+        return response.status_code == 200 and bool(response.get_json()['houses'])
+
+    results = []
+    for houses in args.houses:
+        setup = load_catalogue(args, houses)
+        _, student_documents = generate_users(houses, args.students, args.seed)
+        students = [document_uuid(document) for document in student_documents]
+        print(f"{houses} moradias carregadas em {setup:.1f} s.", file=sys.stderr)
+        for target, call in (('get_all_probas', call_function), ('/recommended-homes', call_endpoint)):
+            result = measure(call, students, args.requests, args.warmup, args.seed)
+            results.append({'target': target, 'houses': houses, **result})
+    return results
+
+
+def regressions(results: list, baseline: list, tolerance: float) -> list:
+    """Retorna as descrições das medições que pioraram mais que 'tolerance' em relação à linha de base."""
+    previous = {(result['target'], result['houses']): result for result in baseline}
+    found = []
+    for result in results:
+        reference = previous.get((result['target'], result['houses']))
+        if reference is None:
+            continue
+        if result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            found.append(f"{result['target']} com {result['houses']} moradias: p95 de "
+                         f"{reference['p95_ms']:.2f} ms para {result['p95_ms']:.2f} ms")
+        if result['throughput'] < reference['throughput'] * (1 - tolerance):
+            found.append(f"{result['target']} com {result['houses']} moradias: throughput de "
+                         f"{reference['throughput']:.1f}/s para {result['throughput']:.1f}/s")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--houses', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=1000, help='Chamadas medidas por função e tamanho.')
+    parser.add_argument('--warmup', type=int, default=50, help='Chamadas descartadas antes de cada medição.')
+    parser.add_argument('--limit', type=int, default=hestia.DEFAULT_RECOMMENDATION_LIMIT)
+    parser.add_argument('--uri', help='URI de um MongoDB local. Sem ela, os documentos são carregados no mongomock.')
+    parser.add_argument('--save', help='Grava os resultados neste arquivo JSON.')
+    parser.add_argument('--baseline', help='Arquivo JSON gravado com --save por uma execução anterior.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Piora relativa aceita. Padrão: 0.2.')
+    args = parser.parse_args()
+
+    hestia.logger.setLevel(logging.WARNING)
+    results = run_suite(args)
+
+    print('| Moradias | Alvo | req/s | p50 | p95 | p99 | erros |')
+    print('|---|---|---|---|---|---|---|')
+    for result in results:
+        print(
+            f"| {result['houses']} | `{result['target']}` | {result['throughput']:.1f} | "
+            f"{result['p50_ms']:.2f} ms | {result['p95_ms']:.2f} ms | {result['p99_ms']:.2f} ms | {result['errors']} |"
+        )
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(results, json.load(file), args.tolerance)
+        for description in found:
+            print(f"Regressão: {description}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Configuração do Gunicorn para executar a API em produção.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app:app
+
+Cada worker é um processo pré-forkado com seu próprio pool de threads (worker 'gthread'),
+sua própria conexão com o MongoDB e seu próprio catálogo residente de moradias. Com
+GUNICORN_PRELOAD=true, a aplicação é carregada uma única vez no processo mestre, que executa a
+inicialização (app.startup(): verificação do MongoDB e carga do catálogo) em when_ready; os workers
+herdam o catálogo e apenas abrem sua própria conexão com o MongoDB e retomam a sincronização ao
+iniciar (post_worker_init). Sem preload, cada worker executa a inicialização depois de carregar a
+aplicação, sem aguardar a carga do catálogo.
+
+Variáveis de ambiente:
+    PORT: Porta HTTP. Padrão: 5000.
+    WEB_CONCURRENCY: Número de processos worker. Padrão: 2 × CPUs + 1.
+    GUNICORN_THREADS: Threads por worker. Padrão: 4.
+    GUNICORN_KEEPALIVE: Segundos que uma conexão keep-alive ociosa é mantida. Padrão: 5.
+    GUNICORN_TIMEOUT: Segundos sem resposta até um worker ser reiniciado. Padrão: 30.
+    GUNICORN_GRACEFUL_TIMEOUT: Segundos para concluir as requisições em andamento no desligamento. Padrão: 30.
+    GUNICORN_MAX_REQUESTS: Requisições atendidas até o worker ser reciclado (0 desativa). Padrão: 10000.
+    GUNICORN_MAX_REQUESTS_JITTER: Variação aleatória de GUNICORN_MAX_REQUESTS, para que os workers
+        não sejam reciclados ao mesmo tempo. Padrão: 1000.
+    GUNICORN_PRELOAD: Carrega a aplicação no processo mestre antes do fork dos workers. Padrão: true.
+    PROMETHEUS_MULTIPROC_DIR: Diretório compartilhado das métricas dos workers, para que /metrics
+        agregue todos os processos. Os arquivos de execuções anteriores são apagados ao iniciar.
+"""
+import glob
+import multiprocessing
+import os
+import sys
+from os import getenv
+
+bind = f"0.0.0.0:{getenv('PORT', 5000)}"
+
+workers = int(getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(getenv('GUNICORN_THREADS', 4))
+
+keepalive = int(getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+max_requests = int(getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+preload_app = getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # Com preload_app, a aplicação já foi importada no mestre e é inicializada antes do fork dos workers,
+    # que herdam o catálogo já carregado. Um RuntimeError (MONGO_INDEXES=require) encerra o Gunicorn.
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.startup(wait_for_catalogue=True)
+
+
+def post_worker_init(worker):
+    # O worker já carregou a aplicação, herdada do mestre (preload) ou importada por ele
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.init_worker()
+
+
+def on_starting(server):
+    # Métricas de uma execução anterior não podem ser somadas às dos novos workers
+    metrics_dir = getenv('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    # Descarta os gauges 'live*' do worker encerrado (reciclado por GUNICORN_MAX_REQUESTS ou por timeout)
+    if getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,132 @@
+"""
+Paridade entre o motor de agregação (scoring_pipeline) e o cálculo em Python (rank_houses).
+
+Um corpus determinístico de moradias e universitários, com os formatos de campo que as duas
+implementações normalizam de formas diferentes, é inserido em uma coleção temporária e cada
+universitário é avaliado pelos dois motores. O mongomock não implementa todos os operadores do
+pipeline ($replaceAll, $convert, ...), então o teste exige um MongoDB real e é ignorado sem
+PARITY_MONGODB_URI. A coleção temporária é apagada ao final.
+
+Uso:
+    PARITY_MONGODB_URI=mongodb://localhost:27017 python -m pytest tests
+"""
+import uuid
+from os import environ
+
+import pytest
+from bson import Binary
+from pymongo import MongoClient
+
+import app as hestia
+
+PARITY_MONGODB_URI = environ.get('PARITY_MONGODB_URI')
+
+pytestmark = pytest.mark.skipif(not PARITY_MONGODB_URI, reason='PARITY_MONGODB_URI não configurada.')
+
+FIELDS = ('animais_estimacao', 'preferencia_genero', 'numero_maximo_pessoas', 'frequencia_fumo', 'frequencia_bebida')
+MISSING = object()
+
+# Moradias: (animais_estimacao, preferencia_genero, numero_maximo_pessoas, frequencia_fumo, frequencia_bebida).
+# MISSING omite o campo do documento.
+HOUSES = [
+    ('[Gosto muito]', '[Feminino]', '[3]', '[Nunca]', '[Raramente]'),
+    (['Gosto muito', 'Indiferente'], 'Masculino', ' 3 ', 'Nunca', 'Raramente'),
+    (['Indiferente', 'Alergia'], 'Feminino', 3, 'Nunca', 'Nunca'),
+    ('[Alergia]', 'Tanto faz', 2, 'Raramente', 'Nunca'),
+    ('Não tenho, mas amo', 'Tanto faz', 3.7, 'Nunca', 'Raramente'),
+    ('[Indiferente]', '[Tanto faz]', 'abc', '[Sempre]', '[Sempre]'),
+    ('Indiferente', 'Feminino', '[4]', 'Sempre', 'Raramente'),
+    ([], 'Masculino', 1, 'Nunca', 'Nunca'),
+    (None, None, None, None, None),
+    (MISSING, MISSING, MISSING, MISSING, MISSING),
+    ('[Gosto muito]', MISSING, 5, None, 'Raramente'),
+    (['Não tenho, mas amo'], '[Feminino]', '10', '[Nunca]', MISSING),
+]
+
+# Universitários, no mesmo formato das moradias
+STUDENTS = [
+    ('[Gosto muito]', '[Feminino]', '[3]', '[Nunca]', '[Raramente]'),
+    (['Gosto muito', 'Indiferente'], 'Masculino', ' 3 ', 'Nunca', 'Raramente'),
+    (['Indiferente', 'Alergia'], 'Feminino', 3, 'Nunca', 'Nunca'),
+    ('[Alergia]', 'Feminino', 3, 'Nunca', 'Nunca'),
+    ('Indiferente', 'Tanto faz', 3.7, 'Nunca', 'Raramente'),
+    ('[Indiferente]', '[Tanto faz]', 'abc', '[Sempre]', '[Sempre]'),
+    ('Não tenho, mas amo', 'Feminino', '[3]', 'Raramente', 'Nunca'),
+    (None, None, None, None, None),
+    (MISSING, MISSING, MISSING, MISSING, MISSING),
+]
+
+# Universitário que não está na coleção: avaliado com filtros vazios pelos dois motores
+NOT_FOUND_UUID = str(uuid.UUID(int=0xFFFF))
+
+VARIANTS = [
+    {},
+    {'exclude_zero': True},
+    {'min_probability': 50},
+    {'min_probability': 40, 'exclude_zero': True},
+]
+
+
+def user_uuid(kind: int, index: int) -> uuid.UUID:
+    return uuid.UUID(int=(kind << 64) | index)
+
+
+def user_document(tipo: str, user: uuid.UUID, values: tuple) -> dict:
+    document = {'tipo': tipo, 'idUsuarioMoradia': Binary(user.bytes, subtype=4)}
+    document.update({field: value for field, value in zip(FIELDS, values) if value is not MISSING})
+    return document
+
+
+@pytest.fixture(scope='module')
+def collection():
+    client = MongoClient(PARITY_MONGODB_URI, serverSelectionTimeoutMS=5000)
+    scratch = client[environ.get('PARITY_MONGODB_DBNAME', 'hestia_test')][f'paridade_{uuid.uuid4().hex}']
+    scratch.insert_many(
+        [user_document('moradia', user_uuid(1, index), values) for index, values in enumerate(HOUSES)]
+        + [user_document('universitario', user_uuid(2, index), values) for index, values in enumerate(STUDENTS)]
+    )
+    hestia.set_collection(scratch)
+    yield scratch
+    hestia.set_collection(None)
+    scratch.drop()
+    client.close()
+
+
+def student_uuids() -> list:
+    return [str(user_uuid(2, index)) for index in range(len(STUDENTS))] + [NOT_FOUND_UUID]
+
+
+@pytest.mark.parametrize('params', VARIANTS)
+@pytest.mark.parametrize('student', student_uuids())
+def test_engines_return_the_same_houses(collection, student, params):
+    profile = hestia.compile_profile(hestia.get_filters(student))
+
+    python = hestia.rank_houses(profile, None, **params)
+    aggregation = hestia.rank_houses_aggregation(profile, **params)
+
+    # Empates são ordenados de formas diferentes (ordem do catálogo × '_id'): compara moradia a moradia
+    assert {house['uid']: house['probability'] for house in aggregation} == pytest.approx(
+        {house['uid']: house['probability'] for house in python}
+    )
+    assert len(aggregation) == len(python)
+
+
+@pytest.mark.parametrize('student', student_uuids())
+def test_engines_return_the_same_page(collection, student):
+    profile = hestia.compile_profile(hestia.get_filters(student))
+
+    python = hestia.rank_houses(profile, None, limit=4, offset=2)
+    aggregation = hestia.rank_houses_aggregation(profile, limit=4, offset=2)
+
+    assert [house['probability'] for house in aggregation] == pytest.approx([house['probability'] for house in python])
+
+
+def test_corpus_has_no_mismatches(collection):
+    result = hestia.check_scoring_parity(students=len(STUDENTS))
+
+    assert result['houses'] == len(HOUSES)
+    assert result['mismatches'] == 0, result['examples']
+
+
+def test_not_found_student_has_empty_filters(collection):
+    assert hestia.get_filters(NOT_FOUND_UUID) == {}
@@ -0,0 +1,135 @@
+"""
+Equivalência entre o cálculo vetorizado e o cálculo escalar de correspondência, e regras de seleção das moradias.
+
+Uma grade determinística de filtros, com os formatos de campo que compile_profile() normaliza (listas,
+valores ausentes, números inválidos ou infinitos), é compilada em perfis. score_groups(),
+batch_match_percentages() e score_group_matrix() são comparados com score_profiles() perfil a perfil, e
+select_top_houses() com uma ordenação de referência. Não usa o MongoDB.
+
+Uso:
+    python -m pytest tests
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+import app as hestia
+
+ANIMALS = (None, 'Alergia', 'Gosto muito', 'Indiferente', ['Não tenho, mas amo', 'Indiferente'], 3)
+GENDERS = ('Feminino', 'Masculino', 'Tanto faz', None)
+MAX_PEOPLE = (1, 3, '3', 'abc', None, float('inf'))
+SMOKING = ('Nunca', 'Sempre', None)
+DRINKING = ('Nunca', 'Raramente')
+
+FILTERS = [
+    {'animais_estimacao': animals, 'preferencia_genero': gender, 'numero_maximo_pessoas': max_people,
+     'frequencia_fumo': smoking, 'frequencia_bebida': drinking}
+    for animals, gender, max_people, smoking, drinking in itertools.product(
+        ANIMALS, GENDERS, MAX_PEOPLE, SMOKING, DRINKING
+    )
+]
+
+# Todas as combinações são moradias; uma amostra fixa delas é usada como universitários
+HOUSE_PROFILES = [hestia.compile_profile(filters) for filters in FILTERS]
+STUDENT_PROFILES = HOUSE_PROFILES[::7] + [hestia.compile_profile({})]
+
+# Casos de select_top_houses(): (limit, offset, min_probability, exclude_zero)
+SELECTION_CASES = [
+    (None, 0, 0.0, False),
+    (None, 0, 0.0, True),
+    (5, 0, 0.0, False),
+    (5, 3, 0.0, False),
+    (10, 95, 0.0, False),
+    (7, 2, 50.0, False),
+    (7, 2, 50.0, True),
+    (0, 0, 0.0, False),
+    (3, 500, 0.0, False),
+    (None, 4, 25.0, True),
+]
+
+
+def reference_selection(probabilities, limit, offset, min_probability, exclude_zero) -> list:
+    eligible = [
+        index for index, probability in enumerate(probabilities)
+        if probability >= min_probability and not (exclude_zero and probability <= 0)
+    ]
+    # Maior probabilidade primeiro; empates pela posição no catálogo
+    ordered = sorted(eligible, key=lambda index: (-probabilities[index], index))
+    return ordered[offset:] if limit is None else ordered[offset:offset + limit]
+
+
+@pytest.fixture(scope='module')
+def houses():
+    return hestia.encode_profiles(HOUSE_PROFILES)
+
+
+def test_encode_profiles_groups_equal_profiles(houses):
+    assert len(houses.allergy) == len(set(HOUSE_PROFILES))
+    assert len(houses.group_index) == len(HOUSE_PROFILES)
+
+
+@pytest.mark.parametrize('student', range(len(STUDENT_PROFILES)))
+def test_batch_match_percentages_match_score_profiles(houses, student):
+    university_profile = STUDENT_PROFILES[student]
+    expected = [hestia.score_profiles(house, university_profile) for house in HOUSE_PROFILES]
+
+    assert hestia.batch_match_percentages(houses, university_profile).tolist() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('student', range(len(STUDENT_PROFILES)))
+def test_score_groups_match_score_profiles(houses, student):
+    university_profile = STUDENT_PROFILES[student]
+    groups = hestia.score_groups(houses, university_profile)
+
+    representatives = {}
+    for profile, group in zip(HOUSE_PROFILES, houses.group_index.tolist()):
+        representatives.setdefault(group, profile)
+    expected = [hestia.score_profiles(representatives[group], university_profile) for group in range(len(groups))]
+    assert groups.tolist() == pytest.approx(expected)
+
+
+def test_score_group_matrix_matches_batch_match_percentages(houses):
+    students = hestia.encode_profiles(STUDENT_PROFILES)
+    matrix = hestia.score_group_matrix(houses, students)
+
+    assert matrix.shape == (len(students.allergy), len(houses.allergy))
+    for university_profile, group in zip(STUDENT_PROFILES, students.group_index.tolist()):
+        assert matrix[group][houses.group_index].tolist() == pytest.approx(
+            hestia.batch_match_percentages(houses, university_profile).tolist()
+        )
+
+
+@pytest.mark.parametrize('case', SELECTION_CASES)
+@pytest.mark.parametrize('seed', range(5))
+def test_select_top_houses_matches_reference_order(case, seed):
+    # Poucos valores distintos, para que quase toda seleção tenha empates no limite da página
+    probabilities = np.random.default_rng(seed).choice([0.0, 25.0, 50.0, 75.0, 100.0], size=100)
+    limit, offset, min_probability, exclude_zero = case
+
+    selected = hestia.select_top_houses(probabilities, limit, offset, min_probability, exclude_zero)
+
+    assert selected.tolist() == reference_selection(probabilities.tolist(), *case)
+
+
+@pytest.mark.parametrize('student', range(0, len(STUDENT_PROFILES), 10))
+def test_select_top_houses_matches_reference_order_on_catalogue(houses, student):
+    probabilities = hestia.batch_match_percentages(houses, STUDENT_PROFILES[student])
+
+    for case in SELECTION_CASES:
+        assert hestia.select_top_houses(probabilities, *case).tolist() == reference_selection(
+            probabilities.tolist(), *case
+        )
+
+
+@pytest.mark.parametrize('exclude_zero', [False, True])
+def test_consecutive_pages_cover_the_ranking_without_repeats(exclude_zero):
+    probabilities = np.random.default_rng(42).choice([0.0, 50.0, 100.0], size=60)
+    ranking = hestia.select_top_houses(probabilities, exclude_zero=exclude_zero).tolist()
+
+    pages = []
+    for offset in range(0, len(ranking) + 7, 7):
+        pages.extend(hestia.select_top_houses(probabilities, 7, offset, exclude_zero=exclude_zero).tolist())
+
+    assert pages == ranking
+    assert len(set(pages)) == len(pages)